@@ -1,23 +1,82 @@
 import os
+import shutil
+import hashlib
 import subprocess
 import tempfile
+import multiprocessing
+import collections
 import fitz
 
+from . import media_cache_helper
+
 PORTABLE_SOFFICE_PATH = r"C:\Users\Ankit.Anand\Downloads\LibreOfficePortable\App\libreoffice\program\soffice.exe"
 PORTABLE_FFMPEG_PATH = r"C:\Users\Ankit.Anand\Downloads\ffmpeg\ffmpeg\bin\ffmpeg.exe"
 
 SOFFICE_EXEC = PORTABLE_SOFFICE_PATH if os.path.exists(PORTABLE_SOFFICE_PATH) else "soffice"
 FFMPEG_EXEC = PORTABLE_FFMPEG_PATH if os.path.exists(PORTABLE_FFMPEG_PATH) else "ffmpeg"
+FFMPEG_THREADS = os.cpu_count() or 1
+FFMPEG_PRESET = "ultrafast"
+# Worker processes used to rasterise PDF pages; lower this when several conversions run at once.
+RENDER_WORKERS = os.cpu_count() or 1
+# Finished slide videos are kept here (keyed by deck md5 and render settings) so unchanged decks are not re-rendered.
+PPTX_VIDEO_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'master_video_maker', 'pptx_videos')
+# FFmpeg's stderr goes to a log file in the temp folder; only this many trailing lines are read back on failure.
+FFMPEG_STDERR_TAIL_LINES = 50
 
 class ConversionError(Exception):
     pass
 
+
+def _render_pdf_pages(pdf_path, page_numbers, output_width, output_dir):
+    """Renders a range of PDF pages to slide_NNN.png files. Top-level so it can run in a worker process."""
+    rendered = []
+    doc = fitz.open(pdf_path)
+    try:
+        for i in page_numbers:
+            page = doc[i]
+            zoom_factor = output_width / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
+            output_image_path = os.path.join(output_dir, f"slide_{i:03d}.png")
+            pix.save(output_image_path)
+            rendered.append(output_image_path)
+    finally:
+        doc.close()
+    return rendered
+
+def _file_md5(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _log_tail(log_path, max_lines=FFMPEG_STDERR_TAIL_LINES):
+    with open(log_path, 'rb') as f:
+        tail = collections.deque(f, maxlen=max_lines)
+    return b''.join(tail).decode('utf-8', 'replace')
+
+
+def _link_or_copy(source, destination):
+    # Unlink first: the destination may share an inode with a cached file, and writing through it would corrupt it.
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
 def convert_pptx_to_video(
     ppt_path: str,
     output_video_path: str,
     slide_duration_seconds: int = 5,
     resolution: str = '1920x1080',
     frame_rate: int = 30,
+    ffmpeg_threads: int = FFMPEG_THREADS,
+    preset: str = FFMPEG_PRESET,
+    render_workers: int = RENDER_WORKERS,
+    pptx_md5: str = None,
     stdout=None,
     style=None
 ):
@@ -40,6 +99,19 @@ def convert_pptx_to_video(
     if output_video_dir and not os.path.exists(output_video_dir):
         os.makedirs(output_video_dir)
 
+    # Drive already reports the md5 of downloaded decks; only hash the file when the caller has none.
+    pptx_md5 = pptx_md5 or _file_md5(ppt_path)
+    cached_video_path = media_cache_helper.get_cached_pptx_video(pptx_md5, slide_duration_seconds, resolution,
+                                                                 frame_rate)
+    if cached_video_path:
+        if os.path.abspath(cached_video_path) != os.path.abspath(output_video_path):
+            _link_or_copy(cached_video_path, output_video_path)
+        _stdout.write(_style.SUCCESS(
+            f"Presentation unchanged since its last conversion. Reused cached video: {output_video_path}"))
+        return
+    if os.path.exists(output_video_path):
+        os.remove(output_video_path)
+
     try:
         with tempfile.TemporaryDirectory(dir=os.path.dirname(output_video_path),
                                          prefix="ppt_video_temp_") as temp_dir:
@@ -86,16 +158,21 @@ def convert_pptx_to_video(
             _stdout.write("Converting PDF pages to PNG images using PyMuPDF...")
             generated_pngs = []
             try:
-                doc = fitz.open(output_pdf_path)
-                for i, page in enumerate(doc):
-                    output_width = int(resolution.split('x')[0])
-                    zoom_factor = output_width / page.rect.width
-
-                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom_factor, zoom_factor))
-                    output_image_path = os.path.join(temp_dir, f"slide_{i:03d}.png")
-                    pix.save(output_image_path)
-                    generated_pngs.append(output_image_path)
-                doc.close()
+                output_width = int(resolution.split('x')[0])
+                with fitz.open(output_pdf_path) as doc:
+                    page_count = doc.page_count
+                workers = max(1, min(render_workers, page_count))
+                chunk_size = -(-page_count // workers)
+                page_chunks = [range(start, min(start + chunk_size, page_count))
+                               for start in range(0, page_count, chunk_size)]
+                if len(page_chunks) <= 1:
+                    generated_pngs = _render_pdf_pages(output_pdf_path, range(page_count), output_width, temp_dir)
+                else:
+                    with multiprocessing.get_context("spawn").Pool(len(page_chunks)) as pool:
+                        results = pool.starmap(
+                            _render_pdf_pages,
+                            [(output_pdf_path, chunk, output_width, temp_dir) for chunk in page_chunks])
+                    generated_pngs = [path for chunk_paths in results for path in chunk_paths]
                 _stdout.write(_style.SUCCESS(
                     f"PDF conversion to {len(generated_pngs)} PNG images complete using PyMuPDF."))
 
@@ -127,12 +204,18 @@ def convert_pptx_to_video(
                 "-vf",
                 f"scale={resolution}:force_original_aspect_ratio=decrease,pad={res_width}:{res_height}:(ow-iw)/2:(oh-ih)/2",
                 "-r", str(frame_rate),
+                "-threads", str(ffmpeg_threads),
+                "-preset", preset,
                 output_video_path
             ]
 
+            ffmpeg_log_path = os.path.join(temp_dir, "ffmpeg.log")
             try:
                 _stdout.write(f"FFmpeg video creation command: {' '.join(ffmpeg_video_command)}")
-                subprocess.run(ffmpeg_video_command, check=True, capture_output=True, text=True, timeout=600)
+                # Streamed to disk rather than held in memory; the progress output of a long deck adds up.
+                with open(ffmpeg_log_path, 'wb') as ffmpeg_log:
+                    subprocess.run(ffmpeg_video_command, check=True, stdout=subprocess.DEVNULL, stderr=ffmpeg_log,
+                                   timeout=600)
                 _stdout.write(_style.SUCCESS(f"Video created successfully: {output_video_path}"))
             except FileNotFoundError:
                 raise ConversionError(
@@ -142,12 +225,19 @@ def convert_pptx_to_video(
                     f"Error: FFmpeg video creation timed out after 600 seconds. Increase timeout if video is very long.")
             except subprocess.CalledProcessError as e:
                 raise ConversionError(
-                    f"Error during FFmpeg video creation:\nStderr: {e.stderr}\nStdout: {e.stdout}\nEnsure FFmpeg arguments are correct and images are valid.")
+                    f"Error during FFmpeg video creation:\nStderr (last {FFMPEG_STDERR_TAIL_LINES} lines): {_log_tail(ffmpeg_log_path)}\nEnsure FFmpeg arguments are correct and images are valid.")
             except Exception as e:
                 raise ConversionError(f"An unexpected error occurred during FFmpeg video processing: {e}")
 
             _stdout.write(f"Temporary directory {temp_dir} automatically cleaned up.")
 
+        os.makedirs(PPTX_VIDEO_CACHE_DIR, exist_ok=True)
+        cached_video_path = os.path.join(
+            PPTX_VIDEO_CACHE_DIR, f"{pptx_md5}_{slide_duration_seconds}s_{resolution}_{frame_rate}fps.mp4")
+        _link_or_copy(output_video_path, cached_video_path)
+        media_cache_helper.store_cached_pptx_video(pptx_md5, slide_duration_seconds, resolution, frame_rate,
+                                                   cached_video_path)
+
     except ConversionError as e:
         raise e
     except Exception as e:
@@ -94,11 +94,13 @@ def get_market_and_zone_name_from_ppt(ppt_path):
             return None, None
 
         first_slide = prs.slides[0]
-        slide_text = ""
+        text_parts = []
         for shape in first_slide.shapes:
             if hasattr(shape, "text_frame") and shape.text_frame:
                 for paragraph in shape.text_frame.paragraphs:
-                    slide_text += paragraph.text + "\n"
+                    text_parts.append(paragraph.text)
+                    text_parts.append("\n")
+        slide_text = "".join(text_parts)
 
         # First, try to find the zone name.
         zone_match = re.search(
@@ -1,13 +1,21 @@
 import os
-import io
+import errno
 import pickle
+import asyncio
+import aiohttp
+import shutil
+import httplib2
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
 from googleapiclient.errors import HttpError
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from . import media_cache_helper
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +27,16 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CREDENTIALS_FILE = os.path.join(BASE_DIR, 'credentials.json')
 TOKEN_FILE_PATH = os.path.join(BASE_DIR, 'token.pickle')
 LAST_CHANGE_TOKEN_FULL_PATH = os.path.join(BASE_DIR, LAST_CHANGE_TOKEN_FILE)
+HTTP_TIMEOUT_SECONDS = 120
+FILE_DOWNLOAD_THREADS = 8
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files'
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+SCAN_CONCURRENCY = 32
+# Content-addressed store of downloaded videos (keyed by Drive md5); download folders only hold hardlinks into it.
+BLOB_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'master_video_maker', 'blobs')
+BLOB_CACHE_MAX_BYTES = 50 * 1024 ** 3
+# os.link failures that mean "no hardlink here" (other filesystem, no permission, link limit) rather than a real error.
+HARDLINK_FALLBACK_ERRNOS = (errno.EXDEV, errno.EPERM, errno.EMLINK)
 
 FILES_TO_DOWNLOAD_MIME_TYPES = [
     'video/mp4',
@@ -34,7 +52,14 @@ FILES_TO_DOWNLOAD_MIME_TYPES = [
 ]
 
 
-def get_drive_service():
+_cached_credentials = None
+
+
+def get_drive_credentials():
+    """Loads (refreshing or re-authorizing if needed) the Drive credentials once per process."""
+    global _cached_credentials
+    if _cached_credentials is not None and _cached_credentials.valid:
+        return _cached_credentials
     creds = None
     if os.path.exists(TOKEN_FILE_PATH):
         try:
@@ -65,17 +90,27 @@ def get_drive_service():
         except Exception as e:
             logger.error(f"Failed to save Drive API token: {e}")
 
-    return build('drive', 'v3', credentials=creds)
+    _cached_credentials = creds
+    return creds
+
+
+def get_drive_service():
+    # One persistent httplib2.Http per service keeps the TLS connection to googleapis.com alive across listing,
+    # batch and media requests. The discovery document ships with the client, so skip the discovery cache lookup.
+    authorized_http = AuthorizedHttp(get_drive_credentials(), http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+    return build('drive', 'v3', http=authorized_http, static_discovery=True, cache_discovery=False)
+
+
+def get_local_file_name(file_name_base, mime_type):
+    return os.path.splitext(file_name_base)[0] + get_file_extension(mime_type)
 
 
 def download_file(service, file_id, file_name_base, destination_folder, mime_type):
-    final_extension = get_file_extension(mime_type)
-    name_without_ext = os.path.splitext(file_name_base)[0]
-    final_file_name = name_without_ext + final_extension
+    final_file_name = get_local_file_name(file_name_base, mime_type)
     filepath = os.path.join(destination_folder, final_file_name)
     if os.path.exists(filepath):
         logger.info(f"Skipping download for '{final_file_name}': File already exists locally.")
-        return
+        return filepath
     logger.info(f"Downloading '{final_file_name}' (ID: {file_id})...")
     try:
         request = None
@@ -98,28 +133,233 @@ def download_file(service, file_id, file_name_base, destination_folder, mime_typ
             logger.error(f"Download request could not be created for {file_name_base} ({mime_type}).")
             return
 
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            if status:
-                logger.info(f"Download progress: {int(status.progress() * 100)}%")
-
-        fh.seek(0)
-        with open(filepath, 'wb') as f:
-            f.write(fh.read())
+        # Stream chunks straight to disk instead of holding the whole video in memory; the .part suffix keeps an
+        # interrupted download from being mistaken for a complete file on the next run. The pid/thread suffix lets two
+        # workers fetch the same blob without clobbering each other's partial file.
+        partial_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open(partial_path, 'wb') as fh:
+                downloader = MediaIoBaseDownload(fh, request)
+                done = False
+                while not done:
+                    status, done = downloader.next_chunk()
+                    if status:
+                        logger.info(f"Download progress: {int(status.progress() * 100)}%")
+            os.replace(partial_path, filepath)
+        except BaseException:
+            # The name is unique to this attempt, so nothing would ever overwrite or reuse it.
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
         logger.info(f"Successfully downloaded '{final_file_name}' to '{filepath}'")
+        return filepath
     except HttpError as error:
         logger.error(f"An error occurred during download for '{final_file_name}': {error}")
     except Exception as e:
         logger.error(f"An unexpected error occurred during download for '{final_file_name}': {e}")
 
 
-def get_last_change_token():
-    if os.path.exists(LAST_CHANGE_TOKEN_FULL_PATH):
+# httplib2 is not thread-safe, so every download thread builds its own Drive service.
+_thread_state = threading.local()
+_service_build_lock = threading.Lock()
+_file_download_executor = None
+_file_download_executor_lock = threading.Lock()
+_folder_name_cache = {}
+# local path -> Drive file id, so two Drive files with the same name never write to the same local file.
+_claimed_local_paths = {}
+_claimed_local_paths_lock = threading.Lock()
+
+
+def get_drive_folder_names(service, folder_ids):
+    """Resolves folder names with a single batched request; results are memoized per process."""
+    missing = [folder_id for folder_id in dict.fromkeys(folder_ids) if folder_id not in _folder_name_cache]
+    if missing:
+        def _callback(request_id, response, exception):
+            if exception is not None:
+                logger.warning(f"Could not resolve name for folder {request_id}: {exception}")
+                return
+            _folder_name_cache[request_id] = response.get('name')
+
+        batch = service.new_batch_http_request(callback=_callback)
+        for folder_id in missing:
+            batch.add(service.files().get(fileId=folder_id, fields='name', supportsAllDrives=True),
+                      request_id=folder_id)
+        batch.execute()
+    return {folder_id: _folder_name_cache.get(folder_id) for folder_id in folder_ids}
+
+
+def get_thread_drive_service():
+    service = getattr(_thread_state, 'service', None)
+    if service is None:
+        # Serialized so concurrent threads do not race on refreshing and rewriting the token file.
+        with _service_build_lock:
+            service = get_drive_service()
+        _thread_state.service = service
+    return service
+
+
+def _get_file_download_executor():
+    # Kept for the life of the process so each thread's Drive service is reused across folders.
+    # Folder threads call this concurrently; two pools would leak one and break the FILE_DOWNLOAD_THREADS cap.
+    global _file_download_executor
+    with _file_download_executor_lock:
+        if _file_download_executor is None:
+            _file_download_executor = ThreadPoolExecutor(max_workers=FILE_DOWNLOAD_THREADS)
+    return _file_download_executor
+
+
+def claim_local_path(file_id, local_path):
+    """
+    Reserves local_path for file_id. Returns False if another Drive file already claimed it; call this in scan order
+    so the first same-named file found keeps the path.
+    """
+    with _claimed_local_paths_lock:
+        owner = _claimed_local_paths.setdefault(os.path.abspath(local_path), file_id)
+    return owner == file_id
+
+
+def _download_folder_file(file_id, item, destination_folder):
+    md5_checksum = item.get('md5Checksum')
+    modified_time = item.get('modifiedTime')
+    local_path = os.path.join(destination_folder, get_local_file_name(item['name'], item['mimeType']))
+    if media_cache_helper.get_cached_file(file_id, md5_checksum, modified_time):
+        logger.info(f"Skipping download for '{item['name']}': unchanged since last run.")
+        return True
+    # A local copy that is not in the cache (or changed on Drive) is stale and must be fetched again.
+    if os.path.exists(local_path):
+        os.remove(local_path)
+    if md5_checksum:
+        filepath = _stage_from_blob_cache(file_id, item, local_path)
+    else:
+        # Google-native exports carry no md5, so they cannot be content-addressed.
+        filepath = download_file(get_thread_drive_service(), file_id, item['name'], destination_folder,
+                                 item['mimeType'])
+    if not filepath:
+        return False
+    media_cache_helper.store_cached_file(file_id, md5_checksum, modified_time, filepath)
+    return True
+
+
+def _stage_from_blob_cache(file_id, item, local_path):
+    """Fetches the file into the blob cache (unless already there) and hardlinks it to local_path."""
+    os.makedirs(BLOB_CACHE_DIR, exist_ok=True)
+    blob_path = os.path.join(BLOB_CACHE_DIR, item['md5Checksum'] + get_file_extension(item['mimeType']))
+    if os.path.exists(blob_path):
+        logger.info(f"Reusing cached copy of '{item['name']}' from {blob_path}")
+        # The mtime doubles as the last-used time for prune_blob_cache.
+        os.utime(blob_path)
+    else:
+        blob_path = download_file(get_thread_drive_service(), file_id, item['md5Checksum'], BLOB_CACHE_DIR,
+                                  item['mimeType'])
+        if not blob_path:
+            return None
+    try:
+        os.link(blob_path, local_path)
+    except FileExistsError:
+        logger.error(f"Not overwriting {local_path} with '{item['name']}' ({file_id}): the file already exists.")
+        return None
+    except OSError as e:
+        if e.errno not in HARDLINK_FALLBACK_ERRNOS:
+            logger.error(f"Could not link '{item['name']}' to {local_path}: {e}")
+            return None
+        # Different filesystem (or no hardlink support): fall back to a real copy.
+        shutil.copy2(blob_path, local_path)
+    return local_path
+
+
+def prune_blob_cache(max_bytes=BLOB_CACHE_MAX_BYTES):
+    """Deletes least recently used blobs until the cache fits in max_bytes. Staged hardlinks keep their data."""
+    if not os.path.isdir(BLOB_CACHE_DIR):
+        return
+    with os.scandir(BLOB_CACHE_DIR) as entries:
+        blobs = [(entry.stat().st_mtime, entry.stat().st_size, entry.path)
+                 for entry in entries if entry.is_file(follow_symlinks=False) and not entry.name.endswith('.part')]
+    total = sum(size for _, size, _ in blobs)
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            logger.info(f"Pruned cached blob {path}")
+        except OSError as e:
+            logger.warning(f"Could not prune cached blob {path}: {e}")
+
+
+def download_folder_files(folder_id, files_in_folder, destination_folder):
+    """
+    Downloads every file of one Drive folder, up to FILE_DOWNLOAD_THREADS at a time. Safe to call from several
+    threads at once; they share the process-wide download pool.
+    Returns (folder_id, files_available, files_failed).
+    """
+    executor = _get_file_download_executor()
+    results = executor.map(lambda kv: _download_folder_file(kv[0], kv[1], destination_folder),
+                           files_in_folder.items())
+    failed = sum(1 for ok in results if not ok)
+    return folder_id, len(files_in_folder) - failed, failed
+
+
+async def _list_folder_async(session, folder_id, mime_types):
+    q_filter = f"'{folder_id}' in parents and (mimeType='{FOLDER_MIME_TYPE}' or ({' or '.join([f'mimeType="{m}"' for m in mime_types])})) and trashed=false"
+    params = {
+        'q': q_filter,
+        'spaces': 'drive',
+        'pageSize': '1000',
+        'fields': 'nextPageToken, files(id, name, mimeType, md5Checksum, modifiedTime, size)',
+        'supportsAllDrives': 'true',
+        'includeItemsFromAllDrives': 'true',
+    }
+    items = []
+    while True:
+        async with session.get(DRIVE_FILES_URL, params=params) as response:
+            data = await response.json()
+        items.extend(data.get('files', []))
+        if not data.get('nextPageToken'):
+            return items
+        params['pageToken'] = data['nextPageToken']
+
+
+async def _scan_folder_tree_async(root_folder_id, mime_types, on_folder_listed):
+    headers = {'Authorization': f"Bearer {get_drive_credentials().token}"}
+    connector = aiohttp.TCPConnector(limit=SCAN_CONCURRENCY)
+    async with aiohttp.ClientSession(headers=headers, connector=connector, raise_for_status=True) as session:
+        scanned_folders = {root_folder_id}
+        pending = {asyncio.ensure_future(_list_folder_async(session, root_folder_id, mime_types)): root_folder_id}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                folder_id = pending.pop(task)
+                error = task.exception()
+                items = None if error else task.result()
+                on_folder_listed(folder_id, items, error)
+                for item in items or []:
+                    if item['mimeType'] == FOLDER_MIME_TYPE and item['id'] not in scanned_folders:
+                        scanned_folders.add(item['id'])
+                        pending[asyncio.ensure_future(
+                            _list_folder_async(session, item['id'], mime_types))] = item['id']
+
+
+def scan_folder_tree(root_folder_id, mime_types, on_folder_listed):
+    """
+    Lists root_folder_id and all of its subfolders, keeping up to SCAN_CONCURRENCY listings in flight at once.
+    on_folder_listed(folder_id, items, error) is called from this thread as each folder's listing completes;
+    items are the folder's subfolders and files of the given MIME types, or None if the listing failed.
+    """
+    asyncio.run(_scan_folder_tree_async(root_folder_id, mime_types, on_folder_listed))
+
+
+def _change_token_path(folder_id=None):
+    if folder_id is None:
+        return LAST_CHANGE_TOKEN_FULL_PATH
+    base, ext = os.path.splitext(LAST_CHANGE_TOKEN_FULL_PATH)
+    return f"{base}_{folder_id}{ext}"
+
+
+def get_last_change_token(folder_id=None):
+    token_path = _change_token_path(folder_id)
+    if os.path.exists(token_path):
         try:
-            with open(LAST_CHANGE_TOKEN_FULL_PATH, 'rb') as f:
+            with open(token_path, 'rb') as f:
                 return pickle.load(f)
         except Exception as e:
             logger.error(f"Error loading last change token: {e}")
@@ -127,14 +367,38 @@ def get_last_change_token():
     return None
 
 
-def save_last_change_token(token):
+def save_last_change_token(token, folder_id=None):
     try:
-        with open(LAST_CHANGE_TOKEN_FULL_PATH, 'wb') as f:
+        with open(_change_token_path(folder_id), 'wb') as f:
             pickle.dump(token, f)
     except Exception as e:
         logger.error(f"Error saving last change token: {e}")
 
 
+def folder_has_changes(service, page_token, root_folder_id):
+    """
+    Walks the Drive change log from page_token and reports whether anything under root_folder_id changed.
+    Removed files carry no parents, so they are conservatively treated as relevant.
+    """
+    while page_token:
+        response = service.changes().list(
+            pageToken=page_token,
+            spaces='drive',
+            pageSize=1000,
+            fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(parents))',
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True,
+        ).execute()
+        for change in response.get('changes', []):
+            if change.get('removed') or 'file' not in change:
+                return True
+            for parent_id in change['file'].get('parents', []):
+                if is_file_in_folder_hierarchy(service, parent_id, root_folder_id):
+                    return True
+        page_token = response.get('nextPageToken')
+    return False
+
+
 @lru_cache(maxsize=None)
 def is_file_in_folder_hierarchy(service, file_id, target_folder_id):
     if file_id == target_folder_id:
@@ -1,8 +1,11 @@
 import os
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
+import errno
+import json
+import logging
+import random
+import ssl
+import threading
+import time
 import uuid
 
 SCOPES = [
@@ -10,51 +13,153 @@ SCOPES = [
     'https://www.googleapis.com/auth/presentations'
 ]
 
+logger = logging.getLogger(__name__)
+
+# Slides/Drive write quota is 60 requests per minute per user; stay just under it.
+API_REQUESTS_PER_SECOND = 55 / 60
+API_BURST_CAPACITY = 5
+# The only retry layer: googleapiclient's own num_retries is left at 0 so every attempt goes through the token bucket
+# and 429s honour Retry-After.
+MAX_API_RETRIES = 5
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+# Drive and Slides still report per-user quota errors as 403; googleapiclient retries only these 403 reasons.
+RETRYABLE_403_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+# Socket errors googleapiclient's _retry_request retries, matched by name because errno values differ by platform.
+RETRYABLE_SOCKET_ERRNOS = {'WSAETIMEDOUT', 'ETIMEDOUT', 'EPIPE', 'ECONNABORTED', 'ECONNREFUSED', 'ECONNRESET'}
+
+
+class TokenBucket:
+    def __init__(self, rate, cap):
+        self.rate = rate
+        self.cap = cap
+        self.tokens = cap
+        self.ts = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.cap, self.tokens + (now - self.ts) * self.rate)
+                self.ts = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                time.sleep((1 - self.tokens) / self.rate)
+
+
+_bucket = TokenBucket(API_REQUESTS_PER_SECOND, API_BURST_CAPACITY)
+
+
+def _is_transient_transport_error(error):
+    if isinstance(error, (ssl.SSLError, TimeoutError, ConnectionError)):
+        return True
+    if isinstance(error, OSError):
+        return errno.errorcode.get(error.errno) in RETRYABLE_SOCKET_ERRNOS
+    # httplib2.ServerNotFoundError: DNS lookup failed.
+    return True
+
+
+def _error_reason(error):
+    """The first 'reason' in an HttpError's JSON body, read the way googleapiclient's _should_retry_response does."""
+    try:
+        error_body = json.loads(error.content.decode('utf-8'))['error']
+        details = next((error_body[key] for key in ('errors', 'status', 'message') if key in error_body), '')
+        if isinstance(details, list) and details:
+            details = details[0]
+            if 'reason' in details:
+                details = details['reason']
+        return details
+    except (AttributeError, UnicodeDecodeError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _is_retryable_http_error(error):
+    status = error.resp.status
+    if status in RETRYABLE_STATUS_CODES:
+        return True
+    return status == 403 and _error_reason(error) in RETRYABLE_403_REASONS
+
+
+def _execute_with_backoff(request):
+    from googleapiclient.errors import HttpError
+    from httplib2 import ServerNotFoundError
+
+    for attempt in range(MAX_API_RETRIES + 1):
+        _bucket.acquire()
+        try:
+            return request.execute(num_retries=0)
+        except (OSError, ServerNotFoundError) as error:
+            # Transient transport failures, the same set googleapiclient's num_retries used to cover.
+            if not _is_transient_transport_error(error) or attempt == MAX_API_RETRIES:
+                raise
+            status = type(error).__name__
+            delay = (2 ** attempt) + random.random()
+        except HttpError as error:
+            status = error.resp.status
+            if not _is_retryable_http_error(error) or attempt == MAX_API_RETRIES:
+                raise
+            delay = (2 ** attempt) + random.random()
+            if status == 429:
+                try:
+                    delay = max(delay, float(error.resp.get('retry-after', '1')))
+                except ValueError:
+                    pass
+        logger.warning("API returned %s. Retrying in %.1fs (attempt %d/%d)...", status, delay, attempt + 1, MAX_API_RETRIES)
+        time.sleep(delay)
+
 
 def authenticate_google_api_user(client_secret_path, token_path):
+    # Google client libraries are heavy to import; only load them when actually talking to the API.
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     if os.path.exists(token_path):
         try:
             creds = Credentials.from_authorized_user_file(token_path, SCOPES)
-            print("Loaded credentials from token.json.")
+            logger.info("Loaded credentials from %s.", token_path)
         except Exception as e:
-            print(f"Error loading token.json: {e}. Re-authenticating.")
+            logger.warning("Error loading %s: %s. Re-authenticating.", token_path, e)
             creds = None
 
     # If there are no (valid) credentials available, let the user log in.
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
-            print("Refreshing access token...")
+            logger.info("Refreshing access token...")
             try:
                 creds.refresh(InstalledAppFlow.from_client_secrets_file(
                     client_secret_path, SCOPES).credentials)
-                print("Access token refreshed.")
+                logger.info("Access token refreshed.")
             except Exception as e:
-                print(f"Error refreshing token: {e}. Re-authenticating.")
+                logger.warning("Error refreshing token: %s. Re-authenticating.", e)
                 creds = None
         if not creds or not creds.valid:
-            print(f"Opening browser for authentication. Please authorize the application.")
+            logger.info("Opening browser for authentication. Please authorize the application.")
             flow = InstalledAppFlow.from_client_secrets_file(
                 client_secret_path, SCOPES
             )
             creds = flow.run_local_server(port=0)
-            print("Authentication successful.")
+            logger.info("Authentication successful.")
         # Save the credentials for the next run
         with open(token_path, 'w') as token:
             token.write(creds.to_json())
-            print(f"Credentials saved to {token_path}")
+            logger.info("Credentials saved to %s", token_path)
 
     try:
         drive_service = build('drive', 'v3', credentials=creds)
         slides_service = build('slides', 'v1', credentials=creds)
-        print("Successfully built Google API services.")
+        logger.debug("Successfully built Google API services.")
         return drive_service, slides_service
-    except Exception as e:
-        print(f"Failed to build API services: {e}")
+    except Exception:
+        logger.exception("Failed to build API services")
         return None, None
 
 
 def create_slides_from_folder(folder_id, client_secret_path, token_path):
+    from googleapiclient.errors import HttpError
+
     drive_service, slides_service = authenticate_google_api_user(client_secret_path, token_path)
     if not drive_service or not slides_service:
         return None
@@ -65,15 +170,23 @@ def create_slides_from_folder(folder_id, client_secret_path, token_path):
     presentation_title = "Generated Presentation"
 
     try:
-        print(f"Listing files in Google Drive folder: {folder_id}...")
-        results = drive_service.files().list(
-            q=f"'{folder_id}' in parents and trashed = false",
-            fields="files(id, name, mimeType)"
-        ).execute()
-        items = results.get('files', [])
+        logger.info("Listing files in Google Drive folder: %s...", folder_id)
+        items = []
+        page_token = None
+        while True:
+            results = _execute_with_backoff(drive_service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields="nextPageToken, files(id, name, mimeType)",
+                pageSize=1000,
+                pageToken=page_token
+            ))
+            items.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
 
         if not items:
-            print(f"No files found in folder: {folder_id}")
+            logger.warning("No files found in folder: %s", folder_id)
             return None
 
         for item in items:
@@ -84,59 +197,61 @@ def create_slides_from_folder(folder_id, client_secret_path, token_path):
             ]:
                 ppt_file_id = item['id']
                 presentation_title = item['name'].replace('.pptx', '').replace('.ppt', '') + " (Converted)"
-                print(f"Found PowerPoint file: '{item['name']}' (ID: {item['id']})")
+                logger.debug("Found PowerPoint file: %r (ID: %s)", item['name'], item['id'])
             elif mime_type == 'application/vnd.google-apps.presentation':
                 google_slides_id = item['id']
                 presentation_title = item['name']
-                print(f"Found existing Google Slides file: '{item['name']}' (ID: {item['id']})")
+                logger.debug("Found existing Google Slides file: %r (ID: %s)", item['name'], item['id'])
             elif mime_type.startswith('video/'):
                 video_files.append({'id': item['id'], 'name': item['name']})
-                print(f"Found video file: '{item['name']}' (ID: {item['id']})")
+                logger.debug("Found video file: %r (ID: %s)", item['name'], item['id'])
 
         target_presentation_id = None
 
         if ppt_file_id:
-            print(f"Converting PowerPoint '{presentation_title}' to Google Slides...")
+            logger.info("Converting PowerPoint %r to Google Slides...", presentation_title)
             copied_file_metadata = {
                 'name': presentation_title,
                 'mimeType': 'application/vnd.google-apps.presentation',
                 'parents': [folder_id]
             }
-            copied_file = drive_service.files().copy(
+            copied_file = _execute_with_backoff(drive_service.files().copy(
                 fileId=ppt_file_id,
-                body=copied_file_metadata
-            ).execute()
+                body=copied_file_metadata,
+                fields='id'
+            ))
             target_presentation_id = copied_file.get('id')
-            print(f"Conversion complete. New Google Slides ID: {target_presentation_id}")
+            logger.info("Conversion complete. New Google Slides ID: %s", target_presentation_id)
         else:
-            print("No PowerPoint or existing Google Slides presentation found in the folder.")
-            print("Creating a new blank Google Slides presentation...")
+            logger.info("No PowerPoint or existing Google Slides presentation found in the folder.")
+            logger.info("Creating a new blank Google Slides presentation...")
             new_presentation_body = {
                 'title': "New Blank Presentation (Generated)",
                 'parents': [folder_id]
             }
-            new_presentation = slides_service.presentations().create(body=new_presentation_body).execute()
+            new_presentation = _execute_with_backoff(
+                slides_service.presentations().create(body=new_presentation_body, fields='presentationId'))
             target_presentation_id = new_presentation.get('presentationId')
-            print(f"Created blank presentation with ID: {target_presentation_id}")
+            logger.info("Created blank presentation with ID: %s", target_presentation_id)
 
         if not target_presentation_id:
-            print("Failed to identify or create a Google Slides presentation.")
+            logger.error("Failed to identify or create a Google Slides presentation.")
             return None
 
         if not video_files:
-            print("No video files found to insert.")
+            logger.info("No video files found to insert.")
             return target_presentation_id
 
-        print("Getting current number of slides...")
-        presentation_details = slides_service.presentations().get(
+        logger.debug("Getting current number of slides...")
+        presentation_details = _execute_with_backoff(slides_service.presentations().get(
             presentationId=target_presentation_id,
             fields='slides'
-        ).execute()
+        ))
 
         num_existing_slides = len(presentation_details.get('slides', []))
-        print(f"Found {num_existing_slides} existing slides.")
+        logger.debug("Found %d existing slides.", num_existing_slides)
 
-        print(f"Inserting {len(video_files)} videos into the presentation...")
+        logger.info("Inserting %d videos into the presentation...", len(video_files))
         requests = []
         for video in video_files:
             new_slide_object_id = f"slide_{uuid.uuid4().hex}"
@@ -146,7 +261,7 @@ def create_slides_from_folder(folder_id, client_secret_path, token_path):
                     'insertionIndex': num_existing_slides
                 }
             })
-            print(f"Added new slide for video: {video['name']}")
+            logger.debug("Added new slide for video: %s", video['name'])
 
             video_element_id = f"video_{uuid.uuid4().hex}"
             requests.append({
@@ -170,23 +285,23 @@ def create_slides_from_folder(folder_id, client_secret_path, token_path):
                     }
                 }
             })
-            print(f"Added video '{video['name']}' to its slide.")
+            logger.debug("Added video %r to its slide.", video['name'])
 
         if requests:
-            slides_service.presentations().batchUpdate(
+            _execute_with_backoff(slides_service.presentations().batchUpdate(
                 presentationId=target_presentation_id,
                 body={'requests': requests}
-            ).execute()
-            print("All videos inserted successfully.")
+            ))
+            logger.info("All videos inserted successfully.")
         else:
-            print("No video insertion requests were generated.")
+            logger.warning("No video insertion requests were generated.")
 
-        print(f"Process complete. Google Slides Presentation ID: {target_presentation_id}")
+        logger.info("Process complete. Google Slides Presentation ID: %s", target_presentation_id)
         return target_presentation_id
 
-    except HttpError as error:
-        print(f"An API error occurred: {error}")
+    except HttpError:
+        logger.exception("Drive/Slides API error")
         return None
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+    except Exception:
+        logger.exception("An unexpected error occurred while creating slides")
         return None
\ No newline at end of file
@@ -0,0 +1,40 @@
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FILE = "master_video_maker.log"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_log_queue = None
+_listener = None
+
+
+def start_queue_logging(level=logging.INFO):
+    """
+    Routes root logging through a queue drained by one background listener that owns the file and console
+    handlers, so logging calls never block on disk or terminal I/O. Safe to call more than once.
+    Like logging.basicConfig, does nothing when the root logger already has handlers (e.g. from Django's LOGGING).
+    """
+    global _log_queue, _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return
+    _log_queue = queue.SimpleQueue()
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.FileHandler(LOG_FILE), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    _listener = QueueListener(_log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(QueueHandler(_log_queue))
+    root.setLevel(level)
+    atexit.register(stop_queue_logging)
+
+
+def stop_queue_logging():
+    global _listener
+    if _listener is not None:
+        # Drains whatever is still queued before the process exits.
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,174 @@
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from contextlib import closing
+
+logger = logging.getLogger(__name__)
+
+# Lives next to the blob and PPTX video caches.
+CACHE_DB_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'master_video_maker', 'media_cache.sqlite3')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS file_cache (
+    file_id TEXT PRIMARY KEY,
+    md5_checksum TEXT,
+    modified_time TEXT,
+    local_path TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pptx_video_cache (
+    pptx_md5 TEXT NOT NULL,
+    slide_dur INTEGER NOT NULL,
+    res TEXT NOT NULL,
+    fps INTEGER NOT NULL,
+    out_path TEXT NOT NULL,
+    PRIMARY KEY (pptx_md5, slide_dur, res, fps)
+);
+CREATE TABLE IF NOT EXISTS probe_cache (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS merge_cache (
+    inputs_sha256 TEXT NOT NULL,
+    out_path TEXT NOT NULL,
+    PRIMARY KEY (inputs_sha256, out_path)
+);
+"""
+
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def _connect():
+    # One short-lived connection per call keeps this safe to use from worker processes and threads.
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+                with closing(sqlite3.connect(CACHE_DB_PATH, timeout=30)) as conn:
+                    conn.executescript(_SCHEMA)
+                _schema_ready = True
+    return sqlite3.connect(CACHE_DB_PATH, timeout=30)
+
+
+def get_cached_file(file_id, md5_checksum, modified_time):
+    """Returns the local path of a previously downloaded Drive file if it is unchanged and still on disk."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT local_path FROM file_cache WHERE file_id = ? AND md5_checksum IS ? AND modified_time IS ?",
+                (file_id, md5_checksum, modified_time)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Media cache lookup failed for file {file_id}: {e}")
+        return None
+    if row and os.path.exists(row[0]):
+        return row[0]
+    return None
+
+
+def store_cached_file(file_id, md5_checksum, modified_time, local_path):
+    try:
+        with closing(_connect()) as conn, conn:
+            # The path now holds this file, so any other Drive file recorded against it is no longer on disk.
+            conn.execute(
+                "DELETE FROM file_cache WHERE local_path = ? AND file_id != ?",
+                (os.path.abspath(local_path), file_id)
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO file_cache (file_id, md5_checksum, modified_time, local_path) VALUES (?, ?, ?, ?)",
+                (file_id, md5_checksum, modified_time, os.path.abspath(local_path))
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record file {file_id} in media cache: {e}")
+
+
+def get_cached_pptx_video(pptx_md5, slide_dur, res, fps):
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT out_path FROM pptx_video_cache WHERE pptx_md5 = ? AND slide_dur = ? AND res = ? AND fps = ?",
+                (pptx_md5, slide_dur, res, fps)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Media cache lookup failed for PPTX {pptx_md5}: {e}")
+        return None
+    if row and os.path.exists(row[0]):
+        return row[0]
+    return None
+
+
+def store_cached_pptx_video(pptx_md5, slide_dur, res, fps, out_path):
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pptx_video_cache (pptx_md5, slide_dur, res, fps, out_path) VALUES (?, ?, ?, ?, ?)",
+                (pptx_md5, slide_dur, res, fps, os.path.abspath(out_path))
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record PPTX {pptx_md5} in media cache: {e}")
+
+
+def get_cached_probe(path, size, mtime_ns):
+    """The stored probe result for path if the file still has this size and mtime, else None."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT result FROM probe_cache WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Media cache lookup failed for probe of {path}: {e}")
+        return None
+    return json.loads(row[0]) if row else None
+
+
+def store_cached_probe(path, size, mtime_ns, result):
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO probe_cache (path, size, mtime_ns, result) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(result))
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record probe of {path} in media cache: {e}")
+
+
+def merge_inputs_key(inputs):
+    """
+    Key for the merge inputs, given as (local file name, content id) pairs. Pairs are sorted by file name, the order
+    merge_videos_in_folder concatenates in, so a rename or reorder changes the key as well as a content change.
+    """
+    return hashlib.sha256(json.dumps(sorted(inputs)).encode()).hexdigest()
+
+
+def is_merge_cached(inputs_sha256, out_path):
+    """True if out_path was produced from exactly these inputs and still exists."""
+    out_path = os.path.abspath(out_path)
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute(
+                "SELECT 1 FROM merge_cache WHERE inputs_sha256 = ? AND out_path = ?",
+                (inputs_sha256, out_path)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"Media cache lookup failed for merge output {out_path}: {e}")
+        return False
+    return bool(row) and os.path.exists(out_path)
+
+
+def store_merge(inputs_sha256, out_path):
+    out_path = os.path.abspath(out_path)
+    try:
+        with closing(_connect()) as conn, conn:
+            # Only the latest inputs are valid for a given output file.
+            conn.execute("DELETE FROM merge_cache WHERE out_path = ?", (out_path,))
+            conn.execute("INSERT INTO merge_cache (inputs_sha256, out_path) VALUES (?, ?)", (inputs_sha256, out_path))
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record merge output {out_path} in media cache: {e}")
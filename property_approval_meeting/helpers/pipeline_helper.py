@@ -1,16 +1,27 @@
 import os
 import re
+import stat
 import io
-import pickle
+import json
 import logging
+import datetime
+import functools
 import mimetypes
+import threading
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
+import httplib2
 from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
+from lxml import etree
 from pptx import Presentation
 
 logger = logging.getLogger(__name__)
@@ -31,7 +42,7 @@ YOUTUBE_SCOPES = [
     'https://www.googleapis.com/auth/youtube.readonly'
 ]
 YOUTUBE_CREDENTIALS_FILE = 'youtube_credentials.json' # Your YouTube API credentials file
-YOUTUBE_TOKEN_FILE = 'youtube_token.pickle' # Specific token file for YouTube
+YOUTUBE_TOKEN_FILE = 'youtube_token.json' # Specific token file for YouTube
 
 # Base directory for credential/token files. Assuming they are in the same directory as this helper file.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -40,14 +51,96 @@ YOUTUBE_TOKEN_PATH = os.path.join(BASE_DIR, YOUTUBE_TOKEN_FILE)
 DRIVE_TOKEN_PATH = os.path.join(BASE_DIR, DRIVE_TOKEN_FILE)
 DRIVE_CREDENTIALS_PATH = os.path.join(BASE_DIR, DRIVE_CREDENTIALS_FILE)
 
+CREDENTIALS_REFRESH_LEEWAY = datetime.timedelta(seconds=300)
+
+# Small files are fetched concurrently; anything larger than the threshold is downloaded serially so a few big
+# videos cannot tie up every worker.
+PARALLEL_DOWNLOAD_WORKERS = 8
+LARGE_DOWNLOAD_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+# Large chunks keep the number of HTTP range requests per video low; other files use a smaller chunk so progress
+# stays granular.
+VIDEO_DOWNLOAD_CHUNK_SIZE = 32 * 1024 * 1024
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+DOWNLOAD_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+
+HTTP_TIMEOUT_SECONDS = 60
+SIMPLE_UPLOAD_MAX_BYTES = 5 * 1024 * 1024
+# Bounded chunks mean a dropped connection during a multi-GB YouTube upload only resends one chunk.
+YOUTUBE_UPLOAD_CHUNK_SIZE = 64 * 1024 * 1024
+
+# httplib2.Http is not thread-safe, so each download thread gets its own Drive service.
+_thread_state = threading.local()
+
+# Bumped whenever a token file is (re)written so _path_exists_cached never serves a stale answer for it.
+_token_gen = 0
+
 # --- Video MIME Types and Extension Mapping (for identifying video files) ---
 FILES_TO_PROCESS_MIME_TYPES = [
     'video/mp4', 'video/webm', 'video/quicktime', 'video/x-flv',
     'video/x-msvideo', 'video/x-ms-wmv', 'application/vnd.google-apps.video'
 ]
 
+# Refined regex to be more flexible and capture until end of line or specific keywords
+MARKET_RE = re.compile(r"Market\s*Name\s*[-:]\s*(.*?)(?=\s*ZONE|\s*Address|\s*STORE SIZE|\n|$)", re.IGNORECASE)
+ZONE_RE = re.compile(r"ZONE\s*:\s*(.*?)(?=\s*STATE|\s*CITY|\s*PIN CODE|\n|$)", re.IGNORECASE)
+IMAGE_PLACEHOLDER_RE = re.compile(r'\s*\[Image \d+\]\s*')
+URL_PATTERN = re.compile(r'https?://[^\s\]\)\}>"]+') # Robust URL pattern
+
+_P_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+_A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+_R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _read_part_rels(pptx_zip, part_name: str) -> dict:
+    """Returns {rId: Target} from the .rels file that belongs to part_name (empty if it has none)."""
+    rels_name = posixpath.join(posixpath.dirname(part_name), '_rels', posixpath.basename(part_name) + '.rels')
+    try:
+        rels_root = etree.fromstring(pptx_zip.read(rels_name))
+    except KeyError:
+        return {}
+    return {rel.get('Id'): rel.get('Target') for rel in rels_root.iterfind(f'{{{_PKG_REL_NS}}}Relationship')}
+
+
+def _read_last_slide_xml(pptx_file_path: str):
+    """Returns (slide_count, last slide root element, {rId: Target} of the last slide); (0, None, {}) if empty."""
+    with zipfile.ZipFile(pptx_file_path) as pptx_zip:
+        presentation = etree.fromstring(pptx_zip.read('ppt/presentation.xml'))
+        slide_ids = presentation.findall(f'{{{_P_NS}}}sldIdLst/{{{_P_NS}}}sldId')
+        if not slide_ids:
+            return 0, None, {}
+        # Slide order comes from sldIdLst, not from the slideN.xml file names.
+        target = _read_part_rels(pptx_zip, 'ppt/presentation.xml')[slide_ids[-1].get(f'{{{_R_NS}}}id')]
+        slide_part = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join('ppt', target))
+        return len(slide_ids), etree.fromstring(pptx_zip.read(slide_part)), _read_part_rels(pptx_zip, slide_part)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_presentation(pptx_file_path: str, mtime: float):
+    """Parses a deck once per (path, mtime) so the extractors below share one Presentation. Treat it as read-only."""
+    return Presentation(pptx_file_path)
+
+
+def clear_presentation_cache():
+    """Drops parsed decks; called at the start of each pipeline run to bound memory."""
+    _load_presentation.cache_clear()
+
+
+def _paragraph_text(paragraph) -> str:
+    """Same text python-pptx reports for a paragraph: runs and fields, with line breaks as vertical tabs."""
+    parts = []
+    for child in paragraph:
+        if child.tag in (f'{{{_A_NS}}}r', f'{{{_A_NS}}}fld'):
+            parts.append(child.findtext(f'{{{_A_NS}}}t') or '')
+        elif child.tag == f'{{{_A_NS}}}br':
+            parts.append('\v')
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=64)
 def get_file_extension(mime_type: str) -> str:
-    """Returns the common file extension for a given MIME type."""
+    """Returns the common file extension for a given MIME type (memoized; the pipeline sees only a few types)."""
     extension = mimetypes.guess_extension(mime_type)
     if extension:
         return extension
@@ -55,7 +148,76 @@ def get_file_extension(mime_type: str) -> str:
         return '.mp4' # Google Drive often converts to mp4 on download
     return ''
 
+class PPTXContext:
+    """
+    One deck shared by the IntegratedPipelineHelper extractors: the first slide's text and the last slide's XML are
+    each read once, however many values are pulled from them.
+    """
+
+    def __init__(self, pptx_file_path: str, mtime: float):
+        self.path = pptx_file_path
+        self._mtime = mtime
+        self._first_slide_paragraphs = None
+        self._last_slide_xml = None
+
+    @property
+    def presentation(self):
+        return _load_presentation(os.path.abspath(self.path), self._mtime)
+
+    @property
+    def first_slide_paragraphs(self) -> list[str]:
+        """Paragraph texts of the first slide's text shapes, in shape order (empty if there are no slides)."""
+        if self._first_slide_paragraphs is None:
+            slides = self.presentation.slides
+            self._first_slide_paragraphs = [
+                paragraph.text
+                for shape in slides[0].shapes if shape.has_text_frame
+                for paragraph in shape.text_frame.paragraphs
+            ] if len(slides) else []
+        return self._first_slide_paragraphs
+
+    @property
+    def last_slide_xml(self):
+        """(slide_count, last slide root element, {rId: Target}) as returned by _read_last_slide_xml."""
+        if self._last_slide_xml is None:
+            self._last_slide_xml = _read_last_slide_xml(self.path)
+        return self._last_slide_xml
+
+
+@functools.lru_cache(maxsize=8)
+def _path_exists_cached(path, generation):
+    return os.path.exists(path)
+
+
+def _bump_token_generation():
+    global _token_gen
+    _token_gen += 1
+
+
+def _authorized_http(creds):
+    # An explicit, long-lived Http per service keeps its TLS connection alive across calls and applies a timeout.
+    return AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+
+
+@functools.lru_cache(maxsize=None)
+def _discovery_document(service_name: str, version: str) -> dict:
+    """The discovery document bundled with googleapiclient, parsed once per process (build() re-parses it)."""
+    return json.loads(discovery_cache.get_static_doc(service_name, version))
+
+
+def _build_service(service_name: str, version: str, creds):
+    return build_from_document(_discovery_document(service_name, version), http=_authorized_http(creds))
+
+
 class IntegratedPipelineHelper:
+    # Authenticated services are shared by every helper instance in the process and rebuilt only when their
+    # credentials come within CREDENTIALS_REFRESH_LEEWAY of expiring.
+    _drive_credentials = None
+    _drive_service_cache = None
+    _youtube_credentials = None
+    _youtube_service_cache = None
+    _auth_lock = threading.Lock()
+
     def __init__(self, output_stream=None, style=None):
         self.output_stream = output_stream if output_stream is not None else print
         self.style = style
@@ -74,84 +236,117 @@ class IntegratedPipelineHelper:
             self.output_stream(message)
 
     # --- Authentication Methods (Shared) ---
+    @staticmethod
+    def _credentials_fresh(creds) -> bool:
+        """True if creds are valid and not about to expire within CREDENTIALS_REFRESH_LEEWAY."""
+        if creds is None or not creds.valid:
+            return False
+        if creds.expiry is None:
+            return True
+        # google-auth keeps expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now > CREDENTIALS_REFRESH_LEEWAY
+
     def get_authenticated_drive_service(self):
-        creds = None
-        if os.path.exists(DRIVE_TOKEN_PATH):
-            self._log(f"Loading Drive credentials from {DRIVE_TOKEN_PATH}...")
-            creds = Credentials.from_authorized_user_file(DRIVE_TOKEN_PATH, DRIVE_SCOPES)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                self._log("Refreshing expired Drive credentials...")
-                try:
-                    creds.refresh(Request())
-                except Exception as e:
-                    self._log(f"Error refreshing Drive token: {e}. Re-authenticating...", style_func=self.style.ERROR)
+        cls = type(self)
+        # Held across the refresh so concurrent callers do not all refresh (or re-authenticate) at once.
+        with cls._auth_lock:
+            if cls._drive_service_cache is not None and self._credentials_fresh(cls._drive_credentials):
+                return cls._drive_service_cache
+
+            creds = cls._drive_credentials
+            if creds is None and _path_exists_cached(DRIVE_TOKEN_PATH, _token_gen):
+                self._log(f"Loading Drive credentials from {DRIVE_TOKEN_PATH}...")
+                creds = Credentials.from_authorized_user_file(DRIVE_TOKEN_PATH, DRIVE_SCOPES)
+
+            if not self._credentials_fresh(creds):
+                if creds and creds.refresh_token:
+                    self._log("Refreshing expired Drive credentials...")
+                    try:
+                        creds.refresh(Request())
+                    except Exception as e:
+                        self._log(f"Error refreshing Drive token: {e}. Re-authenticating...", style_func=self.style.ERROR)
+                        creds = None
+                else:
                     creds = None
 
-            if not creds:
-                self._log(f"No valid Drive credentials found. Initiating authentication flow (check your browser)...")
-                if not os.path.exists(DRIVE_CREDENTIALS_PATH):
-                    self._log(
-                        f"ERROR: '{DRIVE_CREDENTIALS_FILE}' not found at '{DRIVE_CREDENTIALS_PATH}'. "
-                        "Please ensure it's in your project root or helper directory.",
-                        style_func=self.style.ERROR)
-                    return None
+                if not creds:
+                    self._log(f"No valid Drive credentials found. Initiating authentication flow (check your browser)...")
+                    if not os.path.exists(DRIVE_CREDENTIALS_PATH):
+                        self._log(
+                            f"ERROR: '{DRIVE_CREDENTIALS_FILE}' not found at '{DRIVE_CREDENTIALS_PATH}'. "
+                            "Please ensure it's in your project root or helper directory.",
+                            style_func=self.style.ERROR)
+                        return None
 
-                flow = InstalledAppFlow.from_client_secrets_file(DRIVE_CREDENTIALS_PATH, DRIVE_SCOPES)
-                creds = flow.run_local_server(port=0)
+                    flow = InstalledAppFlow.from_client_secrets_file(DRIVE_CREDENTIALS_PATH, DRIVE_SCOPES)
+                    creds = flow.run_local_server(port=0)
 
-            self._log(f"Saving new Drive credentials to {DRIVE_TOKEN_PATH}...")
-            with open(DRIVE_TOKEN_PATH, 'w') as token:
-                token.write(creds.to_json())
+                self._log(f"Saving new Drive credentials to {DRIVE_TOKEN_PATH}...")
+                with open(DRIVE_TOKEN_PATH, 'w') as token:
+                    token.write(creds.to_json())
+                _bump_token_generation()
 
-        self._log("Drive authentication successful.", style_func=self.style.SUCCESS)
-        return build(DRIVE_API_SERVICE_NAME, DRIVE_API_VERSION, credentials=creds)
+            self._log("Drive authentication successful.", style_func=self.style.SUCCESS)
+            cls._drive_credentials = creds
+            cls._drive_service_cache = _build_service(DRIVE_API_SERVICE_NAME, DRIVE_API_VERSION, creds)
+            return cls._drive_service_cache
 
     def get_youtube_service(self):
-        creds = None
-        if os.path.exists(YOUTUBE_TOKEN_PATH):
-            try:
-                with open(YOUTUBE_TOKEN_PATH, 'rb') as token:
-                    creds = pickle.load(token)
-                self._log("Loaded YouTube API credentials from token file.")
-            except Exception as e:
-                self._log(f"Could not load YouTube API token: {e}. Will re-authenticate.", style_func=self.style.WARNING)
-                creds = None
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                self._log("YouTube API credentials expired, refreshing...")
-                creds.refresh(Request())
-            else:
-                self._log(f"Initiating new YouTube API authentication flow using {YOUTUBE_CREDENTIALS_PATH}...")
-                if not os.path.exists(YOUTUBE_CREDENTIALS_PATH):
-                    self._log(f"YouTube credentials file not found: {YOUTUBE_CREDENTIALS_PATH}. Please ensure it's there.", style_func=self.style.ERROR)
-                    raise FileNotFoundError(f"YouTube credentials file not found at {YOUTUBE_CREDENTIALS_PATH}.")
+        cls = type(self)
+        with cls._auth_lock:
+            if cls._youtube_service_cache is not None and self._credentials_fresh(cls._youtube_credentials):
+                return cls._youtube_service_cache
 
-                flow = InstalledAppFlow.from_client_secrets_file(YOUTUBE_CREDENTIALS_PATH, YOUTUBE_SCOPES)
-                creds = flow.run_local_server(port=0)
+            creds = cls._youtube_credentials
+            if creds is None and _path_exists_cached(YOUTUBE_TOKEN_PATH, _token_gen):
+                try:
+                    creds = Credentials.from_authorized_user_file(YOUTUBE_TOKEN_PATH, YOUTUBE_SCOPES)
+                    self._log("Loaded YouTube API credentials from token file.")
+                except Exception as e:
+                    self._log(f"Could not load YouTube API token: {e}. Will re-authenticate.", style_func=self.style.WARNING)
+                    creds = None
 
-            try:
-                with open(YOUTUBE_TOKEN_PATH, 'wb') as token:
-                    pickle.dump(creds, token)
-                self._log(f"YouTube API credentials saved to {YOUTUBE_TOKEN_PATH}.")
-            except Exception as e:
-                self._log(f"Failed to save YouTube API token: {e}", style_func=self.style.ERROR)
+            if not self._credentials_fresh(creds):
+                if creds and creds.refresh_token:
+                    self._log("YouTube API credentials expired, refreshing...")
+                    creds.refresh(Request())
+                else:
+                    self._log(f"Initiating new YouTube API authentication flow using {YOUTUBE_CREDENTIALS_PATH}...")
+                    if not os.path.exists(YOUTUBE_CREDENTIALS_PATH):
+                        self._log(f"YouTube credentials file not found: {YOUTUBE_CREDENTIALS_PATH}. Please ensure it's there.", style_func=self.style.ERROR)
+                        raise FileNotFoundError(f"YouTube credentials file not found at {YOUTUBE_CREDENTIALS_PATH}.")
 
-        self._log("YouTube authentication successful.", style_func=self.style.SUCCESS)
-        return build('youtube', 'v3', credentials=creds)
+                    flow = InstalledAppFlow.from_client_secrets_file(YOUTUBE_CREDENTIALS_PATH, YOUTUBE_SCOPES)
+                    creds = flow.run_local_server(port=0)
+
+                try:
+                    with open(YOUTUBE_TOKEN_PATH, 'w') as token:
+                        token.write(creds.to_json())
+                    _bump_token_generation()
+                    self._log(f"YouTube API credentials saved to {YOUTUBE_TOKEN_PATH}.")
+                except Exception as e:
+                    self._log(f"Failed to save YouTube API token: {e}", style_func=self.style.ERROR)
+
+            self._log("YouTube authentication successful.", style_func=self.style.SUCCESS)
+            cls._youtube_credentials = creds
+            cls._youtube_service_cache = _build_service('youtube', 'v3', creds)
+            return cls._youtube_service_cache
 
     # --- Google Drive File Operations (Combined & Enhanced) ---
-    def download_file_from_drive(self, service, file_id: str, destination_path: str):
+    def download_file_from_drive(self, service, file_id: str, destination_path: str, mime_type: str = None,
+                                 chunk_size: int = None, buffer_size: int = DOWNLOAD_WRITE_BUFFER_SIZE):
         self._log(f"Attempting to download file ID: {file_id} to {destination_path}...")
+        if chunk_size is None:
+            chunk_size = VIDEO_DOWNLOAD_CHUNK_SIZE if mime_type in FILES_TO_PROCESS_MIME_TYPES else DEFAULT_DOWNLOAD_CHUNK_SIZE
         try:
             request = service.files().get_media(fileId=file_id)
-            fh = io.FileIO(destination_path, 'wb')
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while done is False:
-                status, done = downloader.next_chunk()
+            # Buffered so writes reach the disk in large blocks rather than one syscall per received piece.
+            with io.BufferedWriter(io.FileIO(destination_path, 'wb'), buffer_size=buffer_size) as fh:
+                downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size)
+                done = False
+                while done is False:
+                    status, done = downloader.next_chunk()
             self._log(f"Download successful: {destination_path}")
             return True
         except HttpError as error:
@@ -163,13 +358,52 @@ class IntegratedPipelineHelper:
                       style_func=self.style.ERROR)
             return False
 
+    def _thread_drive_service(self):
+        service = getattr(_thread_state, 'drive_service', None)
+        if service is None:
+            service = _build_service(DRIVE_API_SERVICE_NAME, DRIVE_API_VERSION, type(self)._drive_credentials)
+            _thread_state.drive_service = service
+        return service
+
+    def download_files_from_drive(self, service, files: list[tuple[str, str]], file_sizes: dict = None,
+                                  mime_types: dict = None, max_workers: int = PARALLEL_DOWNLOAD_WORKERS) -> dict:
+        """
+        Downloads [(file_id, destination_path), ...]. Files up to LARGE_DOWNLOAD_THRESHOLD_BYTES (per file_sizes,
+        unknown sizes count as small) run on a thread pool while larger ones are fetched one by one on `service`.
+        mime_types ({file_id: mime_type}) picks the chunk size. Returns {file_id: success_bool}.
+        """
+        file_sizes = file_sizes or {}
+        mime_types = mime_types or {}
+        small_files = [f for f in files if int(file_sizes.get(f[0]) or 0) <= LARGE_DOWNLOAD_THRESHOLD_BYTES]
+        large_files = [f for f in files if int(file_sizes.get(f[0]) or 0) > LARGE_DOWNLOAD_THRESHOLD_BYTES]
+        results = {}
+        if small_files and not self.get_authenticated_drive_service():
+            # Worker threads build their services from the cached credentials.
+            return {file_id: False for file_id, _ in files}
+
+        def _download(file_id, destination_path):
+            return self.download_file_from_drive(self._thread_drive_service(), file_id, destination_path,
+                                                 mime_type=mime_types.get(file_id))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(_download, file_id, destination_path): file_id
+                       for file_id, destination_path in small_files}
+            for file_id, destination_path in large_files:
+                results[file_id] = self.download_file_from_drive(service, file_id, destination_path,
+                                                                 mime_type=mime_types.get(file_id))
+            for future, file_id in futures.items():
+                results[file_id] = future.result()
+        return results
+
     def upload_file_to_drive(self, service, file_name: str, file_path: str, mime_type: str, parent_folder_id: str):
         self._log(f"Attempting to upload file '{file_name}' to Drive folder '{parent_folder_id}'...")
         file_metadata = {
             'name': file_name,
             'parents': [parent_folder_id]
         }
-        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
+        # Small files go up in a single multipart request; a resumable session costs an extra round trip.
+        resumable = os.path.getsize(file_path) > SIMPLE_UPLOAD_MAX_BYTES
+        media = MediaFileUpload(file_path, mimetype=mime_type, resumable=resumable)
         try:
             file = service.files().create(body=file_metadata, media_body=media, fields='id').execute()
             self._log(f"Upload successful: {file_name} (New Drive ID: {file.get('id')})", style_func=self.style.SUCCESS)
@@ -257,42 +491,54 @@ class IntegratedPipelineHelper:
             return False
 
     # --- PPTX Parsing Methods (Combined & Enhanced) ---
-    def get_market_and_zone_name_from_ppt(self, pptx_file_path: str) -> tuple[str, str]:
-        self._log(f"Extracting market and zone name from PPTX: {pptx_file_path}")
-        if not os.path.exists(pptx_file_path):
+    def open_pptx_context(self, pptx_file_path: str):
+        """Returns a PPTXContext to share between the extractors below, or None if the path is not a .pptx file."""
+        pptx_stat = self._stat_pptx_file(pptx_file_path)
+        if pptx_stat is None:
+            return None
+        return PPTXContext(pptx_file_path, pptx_stat.st_mtime)
+
+    def _stat_pptx_file(self, pptx_file_path: str):
+        """Returns the os.stat_result of a regular .pptx file, or None (after logging why). One stat() per call."""
+        try:
+            pptx_stat = os.stat(pptx_file_path)
+        except OSError:
             self._log(f"Error: PPTX file not found locally at '{pptx_file_path}'", style_func=self.style.ERROR)
-            return None, None
+            return None
+        if not stat.S_ISREG(pptx_stat.st_mode) or not pptx_file_path.lower().endswith('.pptx'):
+            self._log(f"Error: '{pptx_file_path}' is not a .pptx file.", style_func=self.style.ERROR)
+            return None
+        return pptx_stat
+
+    def get_market_and_zone_name_from_ppt(self, pptx_file_path: str, ctx: 'PPTXContext' = None) -> tuple[str, str]:
+        self._log(f"Extracting market and zone name from PPTX: {pptx_file_path}")
+        if ctx is None:
+            ctx = self.open_pptx_context(pptx_file_path)
+            if ctx is None:
+                return None, None
 
         market_name = None
         zone_name = None
         try:
-            prs = Presentation(pptx_file_path)
-            if not prs.slides:
+            if not ctx.presentation.slides:
                 self._log("PPT has no slides.")
                 return None, None
 
             # Check first slide for Market Name and Zone
-            first_slide = prs.slides[0]
-            slide_text = ""
-            for shape in first_slide.shapes:
-                if shape.has_text_frame:
-                    for paragraph in shape.text_frame.paragraphs:
-                        for run in paragraph.runs:
-                            slide_text += run.text + " "
-
-            # Refined regex to be more flexible and capture until end of line or specific keywords
-            market_match = re.search(r"Market\s*Name\s*[-:]\s*(.*?)(?=\s*ZONE|\s*Address|\s*STORE SIZE|\n|$)", slide_text, re.IGNORECASE)
+            slide_text = " ".join(ctx.first_slide_paragraphs)
+            market_match = MARKET_RE.search(slide_text)
+            zone_match = ZONE_RE.search(slide_text)
+
             if market_match:
                 market_name = market_match.group(1).strip()
-                market_name = re.sub(r'\s*\[Image \d+\]\s*', '', market_name).strip() # Clean up image placeholders
+                market_name = IMAGE_PLACEHOLDER_RE.sub('', market_name).strip() # Clean up image placeholders
                 self._log(f"Extracted Market Name: '{market_name}'")
             else:
                 self._log("Could not find 'Market Name - ' on the first slide.", style_func=self.style.WARNING)
 
-            zone_match = re.search(r"ZONE\s*:\s*(.*?)(?=\s*STATE|\s*CITY|\s*PIN CODE|\n|$)", slide_text, re.IGNORECASE)
             if zone_match:
                 zone_name = zone_match.group(1).strip()
-                zone_name = re.sub(r'\s*\[Image \d+\]\s*', '', zone_name).strip() # Clean up image placeholders
+                zone_name = IMAGE_PLACEHOLDER_RE.sub('', zone_name).strip() # Clean up image placeholders
                 self._log(f"Extracted Zone Name: '{zone_name}'")
             else:
                 self._log("Could not find 'ZONE : ' on the first slide.", style_func=self.style.WARNING)
@@ -302,34 +548,34 @@ class IntegratedPipelineHelper:
             self._log(f"An error occurred while reading the PPT for market/zone: {e}", style_func=self.style.ERROR)
             return None, None
 
-    def get_market_name_prefix_for_videos(self, pptx_file_path: str) -> str:
+    def get_market_name_prefix_for_videos(self, pptx_file_path: str, ctx: 'PPTXContext' = None) -> str:
         self._log(f"Extracting market name prefix for videos from PPTX: {pptx_file_path}")
-        if not os.path.exists(pptx_file_path):
-            self._log(f"Error: PPTX file not found locally at '{pptx_file_path}'", style_func=self.style.ERROR)
-            return ""
+        if ctx is None:
+            ctx = self.open_pptx_context(pptx_file_path)
+            if ctx is None:
+                return ""
 
         try:
-            prs = Presentation(pptx_file_path)
-            if not prs.slides:
+            if not ctx.presentation.slides:
                 self._log(f"No slides found in '{pptx_file_path}'.")
                 return ""
 
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if shape.has_text_frame:
-                        for paragraph in shape.text_frame.paragraphs:
-                            full_text = "".join([run.text for run in paragraph.runs])
-                            if "Market Name -" in full_text:
-                                market_name_value = full_text.split("Market Name -", 1)[1].strip()
-                                # Only take the part after the last underscore if present, else use full value
-                                if '_' in market_name_value:
-                                    prefix = market_name_value.rsplit('_', 1)[1].strip()
-                                    self._log(f"Extracted market name prefix: '{prefix}'")
-                                    return prefix
-                                else:
-                                    self._log(f"No underscore found in market name: '{market_name_value}'. Using full value as prefix.", style_func=self.style.WARNING)
-                                    return market_name_value
-            self._log("Market Name field not found in the presentation for video prefixing.", style_func=self.style.WARNING)
+            # The market name lives on the first slide (as in get_market_and_zone_name_from_ppt), so only that
+            # slide is read. Paragraphs are newline-joined so the value still ends with its own paragraph.
+            slide_text = "\n".join(ctx.first_slide_paragraphs)
+            _, marker, after_marker = slide_text.partition("Market Name -")
+            if marker:
+                market_name_value = after_marker.partition("\n")[0].strip()
+                # Only take the part after the last underscore if present, else use full value
+                _, underscore, last_part = market_name_value.rpartition('_')
+                if underscore:
+                    prefix = last_part.strip()
+                    self._log(f"Extracted market name prefix: '{prefix}'")
+                    return prefix
+                else:
+                    self._log(f"No underscore found in market name: '{market_name_value}'. Using full value as prefix.", style_func=self.style.WARNING)
+                    return market_name_value
+            self._log("Market Name field not found on the first slide for video prefixing.", style_func=self.style.WARNING)
             return ""
 
         except Exception as e:
@@ -337,107 +583,83 @@ class IntegratedPipelineHelper:
             return ""
 
 
-    def extract_all_potential_links_from_last_slide(self, pptx_file_path: str) -> list[dict]:
+    def extract_all_potential_links_from_last_slide(self, pptx_file_path: str, ctx: 'PPTXContext' = None) -> list[dict]:
         self._log(f"Extracting links from PPTX: {pptx_file_path}")
-        if not os.path.exists(pptx_file_path):
-            self._log(f"Error: PPTX file not found locally at '{pptx_file_path}'", style_func=self.style.ERROR)
-            return []
-        if not pptx_file_path.lower().endswith('.pptx'):
-            self._log(f"Error: '{pptx_file_path}' is not a .pptx file.", style_func=self.style.ERROR)
-            return []
+        if ctx is None:
+            ctx = self.open_pptx_context(pptx_file_path)
+            if ctx is None:
+                return []
 
-        found_links_with_names = []
-        url_pattern = re.compile(r'https?://[^\s\]\)\}>"]+') # Robust URL pattern
+        # Keyed by URL so duplicates are merged as they are found; a later hit can fill in a missing name.
+        unique_links_with_names = {}
 
         try:
-            prs = Presentation(pptx_file_path)
-            if not prs.slides:
+            # URL extraction only needs the slide XML, so read it straight from the package with lxml rather than
+            # building python-pptx's object model for the whole presentation.
+            slide_count, slide_root, slide_rel_targets = ctx.last_slide_xml
+            if not slide_count:
                 self._log(f"No slides found in '{pptx_file_path}'.")
                 return []
 
-            last_slide = prs.slides[-1]
-            self._log(f"Analyzing the last slide (Slide {len(prs.slides)}) for all potential links and associated names...")
-
-            def get_text_from_cell(cell):
-                text_content = []
-                if cell.text_frame:
-                    for paragraph in cell.text_frame.paragraphs:
-                        text_content.append("".join([run.text for run in paragraph.runs]))
-                return " ".join(text_content).strip()
-
-            # Helper function to find URLs in a text frame, associating with a name if provided
-            def find_urls_in_text_content(text_frame_obj, associated_name=None):
-                for paragraph in text_frame_obj.paragraphs:
-                    full_text = "".join([run.text for run in paragraph.runs])
-                    # Find URLs directly in the text content
-                    for match in url_pattern.finditer(full_text):
-                        found_links_with_names.append({
-                            'name': associated_name if associated_name else None,
-                            'link': match.group(0).strip()
-                        })
-                    # Also check for explicit hyperlinks on runs
-                    for run in paragraph.runs:
-                        if run.hyperlink.address:
-                            url = run.hyperlink.address
-                            if url:
-                                found_links_with_names.append({
-                                    'name': associated_name if associated_name else None,
-                                    'link': url
-                                })
-
-            for shape in last_slide.shapes:
-                # Check for hyperlinks on shapes (e.g., buttons)
-                if hasattr(shape, 'action') and shape.action.hyperlink:
-                    url = shape.action.hyperlink.address
+            self._log(f"Analyzing the last slide (Slide {slide_count}) for all potential links and associated names...")
+
+            def get_text_from_cell(tc):
+                return " ".join(_paragraph_text(p) for p in tc.iterfind(f'{{{_A_NS}}}txBody/{{{_A_NS}}}p')).strip()
+
+            def add_link(url, name):
+                entry = unique_links_with_names.get(url)
+                if entry is None:
+                    unique_links_with_names[url] = {'name': name, 'link': url}
+                elif name is not None and entry['name'] is None:
+                    entry['name'] = name
+
+            # Helper function to find URLs in a text body, associating with a name if provided
+            def find_urls_in_text_content(tx_body, associated_name=None):
+                # Find URLs directly in the text content; one scan over the whole body (newlines cannot be part of
+                # a URL, so matches never span paragraphs)
+                full_text = "\n".join(_paragraph_text(p) for p in tx_body.iterfind(f'{{{_A_NS}}}p'))
+                for url in URL_PATTERN.findall(full_text):
+                    add_link(url, associated_name if associated_name else None)
+                # Also check for explicit hyperlinks on runs
+                for hlink in tx_body.iterfind(f'{{{_A_NS}}}p/{{{_A_NS}}}r/{{{_A_NS}}}rPr/{{{_A_NS}}}hlinkClick'):
+                    url = slide_rel_targets.get(hlink.get(f'{{{_R_NS}}}id'))
                     if url:
-                        found_links_with_names.append({'name': None, 'link': url})
+                        add_link(url, associated_name if associated_name else None)
 
+            # Top-level shapes only, in slide order (matching slide.shapes).
+            sp_tree = slide_root.find(f'{{{_P_NS}}}cSld/{{{_P_NS}}}spTree')
+            for shape in (sp_tree if sp_tree is not None else []):
                 # Check text frames in shapes
-                if shape.has_text_frame:
-                    find_urls_in_text_content(shape.text_frame)
+                tx_body = shape.find(f'{{{_P_NS}}}txBody')
+                if shape.tag == f'{{{_P_NS}}}sp' and tx_body is not None:
+                    find_urls_in_text_content(tx_body)
 
                 # Check tables for text frames and associated names
-                if shape.has_table:
-                    table = shape.table
+                table = shape.find(f'{{{_A_NS}}}graphic/{{{_A_NS}}}graphicData/{{{_A_NS}}}tbl')
+                if shape.tag == f'{{{_P_NS}}}graphicFrame' and table is not None:
+                    rows = table.findall(f'{{{_A_NS}}}tr')
                     name_col_idx = -1
                     store_name_col_idx = -1
-                    if table.rows:
-                        header_row = table.rows[0]
-                        for i, cell in enumerate(header_row.cells):
+                    if rows:
+                        for i, cell in enumerate(rows[0].iterfind(f'{{{_A_NS}}}tc')):
                             cell_text = get_text_from_cell(cell).lower().strip()
                             if "name" == cell_text:
                                 name_col_idx = i
                             elif "store name" == cell_text:
                                 store_name_col_idx = i
 
-                    for row_idx, row in enumerate(table.rows):
-                        if row_idx == 0: continue # Skip header
-
+                    for row in rows[1:]: # Skip header
+                        cells = row.findall(f'{{{_A_NS}}}tc')
                         current_row_name = None
-                        if name_col_idx != -1 and name_col_idx < len(row.cells):
-                            current_row_name = get_text_from_cell(row.cells[name_col_idx])
-                        elif store_name_col_idx != -1 and store_name_col_idx < len(row.cells):
-                            current_row_name = get_text_from_cell(row.cells[store_name_col_idx])
-
-                        for cell in row.cells:
-                            if cell.text_frame:
-                                find_urls_in_text_content(cell.text_frame, associated_name=current_row_name)
-
-                # Check images for hyperlinks
-                if hasattr(shape, 'image') and hasattr(shape.image, 'hyperlink') and shape.image.hyperlink.address:
-                    url = shape.image.hyperlink.address
-                    if url:
-                        found_links_with_names.append({'name': None, 'link': url})
-
-            # Deduplicate links and prioritize names if multiple entries for same link
-            unique_links_with_names = {}
-            for item in found_links_with_names:
-                link = item['link']
-                name = item['name']
-                if link not in unique_links_with_names:
-                    unique_links_with_names[link] = {'name': name, 'link': link}
-                elif name is not None and unique_links_with_names[link]['name'] is None:
-                    unique_links_with_names[link]['name'] = name
+                        if name_col_idx != -1 and name_col_idx < len(cells):
+                            current_row_name = get_text_from_cell(cells[name_col_idx])
+                        elif store_name_col_idx != -1 and store_name_col_idx < len(cells):
+                            current_row_name = get_text_from_cell(cells[store_name_col_idx])
+
+                        for cell in cells:
+                            cell_body = cell.find(f'{{{_A_NS}}}txBody')
+                            if cell_body is not None:
+                                find_urls_in_text_content(cell_body, associated_name=current_row_name)
 
             return list(unique_links_with_names.values())
 
@@ -466,7 +688,7 @@ class IntegratedPipelineHelper:
             }
         }
 
-        media_body = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+        media_body = MediaFileUpload(file_path, chunksize=YOUTUBE_UPLOAD_CHUNK_SIZE, resumable=True)
 
         try:
             request = youtube_service.videos().insert(
@@ -476,10 +698,15 @@ class IntegratedPipelineHelper:
             )
 
             response = None
+            last_reported = -1
             while response is None:
                 status, response = request.next_chunk()
                 if status:
-                    self._log(f"Upload progress for '{title}': {int(status.progress() * 100)}%")
+                    percent = int(status.progress() * 100)
+                    # Only report when progress enters a new 10% bucket.
+                    if percent // 10 != last_reported // 10:
+                        self._log(f"Upload progress for '{title}': {percent}%")
+                        last_reported = percent
 
             video_id = response.get('id')
             self._log(f"Successfully uploaded video: '{title}' (Video ID: {video_id})", style_func=self.style.SUCCESS)
@@ -1,9 +1,16 @@
 import subprocess
 import os
 
-def remove_audio_from_video(input_video_path, output_video_path):
-    FIXED_FFMPEG_PATH = "C:\\Users\\Ankit.Anand\\Downloads\\ffmpeg\\ffmpeg\\bin\\ffmpeg.exe"
-    ffmpeg_cmd_name = FIXED_FFMPEG_PATH
+FIXED_FFMPEG_PATH = "C:\\Users\\Ankit.Anand\\Downloads\\ffmpeg\\ffmpeg\\bin\\ffmpeg.exe"
+
+# Set once the FFmpeg binary has answered '-version'; later calls skip the probe process.
+_FFMPEG_CHECKED = False
+
+
+def _ensure_ffmpeg(ffmpeg_cmd_name):
+    global _FFMPEG_CHECKED
+    if _FFMPEG_CHECKED:
+        return True
     try:
         subprocess.run([ffmpeg_cmd_name, '-version'], check=True, capture_output=True, text=True)
     except FileNotFoundError:
@@ -19,12 +26,22 @@ def remove_audio_from_video(input_video_path, output_video_path):
     except Exception as e:
         print(f"An unexpected error occurred while checking FFmpeg: {e}")
         return False
+    _FFMPEG_CHECKED = True
+    return True
+
+
+def remove_audio_from_video(input_video_path, output_video_path):
+    ffmpeg_cmd_name = FIXED_FFMPEG_PATH
+    if not _ensure_ffmpeg(ffmpeg_cmd_name):
+        return False
 
     if not os.path.exists(input_video_path):
         print(f"Error: Input video file not found at '{input_video_path}'")
         return False
     ffmpeg_command = [
         ffmpeg_cmd_name,
+        '-loglevel', 'error',
+        '-nostats',
         '-i', input_video_path,
         '-c:v', 'copy',
         '-an',
@@ -35,18 +52,18 @@ def remove_audio_from_video(input_video_path, output_video_path):
     print(f"Executing FFmpeg command: {' '.join(ffmpeg_command)}")
 
     try:
-        # Run the FFmpeg command
-        process = subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True)
-        print("FFmpeg output:")
-        print(process.stdout)
-        print(process.stderr)
+        # Run the FFmpeg command. With '-loglevel error' stderr only carries problems, so stdout is discarded
+        # instead of being buffered in memory.
+        process = subprocess.run(ffmpeg_command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if process.stderr:
+            print("FFmpeg output:")
+            print(process.stderr.decode('utf-8', 'replace'))
         print(f"Successfully removed audio. Output saved to: {output_video_path}")
         return True
     except subprocess.CalledProcessError as e:
         print(f"Error during FFmpeg execution: {e}")
         print(f"Command failed with exit code {e.returncode}")
-        print(f"Stdout: {e.stdout}")
-        print(f"Stderr: {e.stderr}")
+        print(f"Stderr: {e.stderr.decode('utf-8', 'replace')}")
         return False
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
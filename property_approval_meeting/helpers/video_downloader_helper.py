@@ -1,23 +1,237 @@
 import os
 import re
+import json
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import shutil
+import queue
+import httplib2
 import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, parse_qs
 import io
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaIoBaseDownload
+from .video_merger_helper import FFMPEG_PATH
 
 SCOPES = ['https://www.googleapis.com/auth/drive.readonly']  # Read-only access for downloading
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 GDRIVE_CREDENTIALS_FILE = os.path.join(BASE_DIR, 'credentials.json')
 GDRIVE_TOKEN_FILE = os.path.join(BASE_DIR, 'token.json')
+HTTP_TIMEOUT_SECONDS = 60
+YTDLP_CONCURRENT_FRAGMENTS = 4  # Parallel HLS/DASH fragment fetches within each video
+# Stream merging stream-copies every input into one file, so ask for H.264/AAC wherever the site offers it.
+YTDLP_STREAM_MERGE_FORMAT = 'b[vcodec^=avc1][acodec^=mp4a]/bv*[vcodec^=avc1]+ba[acodec^=mp4a]/b'
+# The MediaIoBaseDownload default of 100 KiB costs one HTTP range request per chunk; large chunks keep video
+# downloads from being round-trip bound.
+GDRIVE_DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+DOWNLOAD_WRITE_BUFFER_SIZE = 4 * 1024 * 1024
+HTTP_DOWNLOAD_CHUNK_SIZE = 1 << 20
+RANGE_STRIPE_SIZE = 16 * 1024 * 1024  # Bytes fetched per Range request when a direct link is downloaded in parallel
+WRITE_QUEUE_DEPTH = 8  # Chunks a download may run ahead of its disk writes
 
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_READ_TIMEOUT_SECONDS = 60
+GENERIC_DOWNLOAD_CONCURRENCY = 16
 
-def get_gdrive_authenticated_service():
+# Per-output-directory records of finished downloads, so re-running a URL list only fetches what is new or changed.
+MANIFEST_FILE_NAME = '.manifest.jsonl'
+
+# Caps simultaneous downloads from any one host so parallel workers do not overload it.
+PER_HOST_CONCURRENCY = 2
+
+YTDLP, GDRIVE, GENERIC = 'yt-dlp', 'gdrive', 'generic'
+# Looked up by host and then by each parent domain, so subdomains such as m.youtube.com resolve too.
+HOST_HANDLERS = {
+    'youtube.com': YTDLP,
+    'youtu.be': YTDLP,
+    'vimeo.com': YTDLP,
+    'dailymotion.com': YTDLP,
+    'drive.google.com': GDRIVE,
+}
+VIDEO_EXTENSIONS = frozenset({'.mp4', '.mov', '.webm', '.avi', '.mkv', '.flv'})
+
+GDRIVE_METADATA_FIELDS = 'name, mimeType, size, md5Checksum'
+GDRIVE_BATCH_SIZE = 100  # Drive's limit on calls per batch request
+
+GDRIVE_FILE_ID_RE = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+CONTENT_DISPOSITION_FILENAME_RE = re.compile(r'filename\*?=(?:UTF-8\'\')?([^;]+)')
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+# googleapiclient's httplib2 transport is not thread-safe, so each download thread gets its own Drive service.
+_thread_state = threading.local()
+
+
+def _build_http_session():
+    # One pooled session for every direct-link request, so downloads from the same host reuse TCP/TLS connections.
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Video bodies are already compressed; asking for identity also keeps Content-Length equal to the file size.
+    session.headers['Accept-Encoding'] = 'identity'
+    return session
+
+
+_http_session = _build_http_session()
+_cached_credentials = None
+_credentials_lock = threading.Lock()
+
+
+class _BackgroundWriter:
+    """File-like sink whose writes happen on a separate thread, so the next network read overlaps the disk write."""
+
+    def __init__(self, fileobj, depth=WRITE_QUEUE_DEPTH):
+        self._file = fileobj
+        self._queue = queue.Queue(maxsize=depth)
+        self._error = None
+        self._thread = threading.Thread(target=self._drain, daemon=True)
+        self._thread.start()
+
+    def _drain(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                return
+            if self._error is None:
+                try:
+                    self._file.write(data)
+                except Exception as e:
+                    self._error = e
+
+    def write(self, data):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(data)
+        return len(data)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DownloadManifest:
+    """
+    Thread-safe url -> {path, size, etag} record of finished downloads in one output directory. Stored as JSON lines
+    that are appended as downloads finish, so an interrupted run keeps everything it completed; the last line for a
+    URL wins.
+    """
+
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_FILE_NAME)
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file = None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._entries[record['url']] = record
+                    except (ValueError, KeyError):
+                        continue  # Torn last line from an interrupted run.
+        except FileNotFoundError:
+            pass
+
+    def get_local(self, url):
+        """The entry for url if its file is still on disk at the recorded size, else None."""
+        with self._lock:
+            entry = self._entries.get(url)
+        if not entry:
+            return None
+        try:
+            if os.path.getsize(entry['path']) == entry['size']:
+                return entry
+        except OSError:
+            pass
+        return None
+
+    def record(self, url, path, etag=None):
+        record = {'url': url, 'path': os.path.abspath(path), 'size': os.path.getsize(path), 'etag': etag}
+        with self._lock:
+            self._entries[url] = record
+            # Opened once and line-buffered: each record still reaches the file as soon as it is written, without an
+            # open/close per download.
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+            self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def _remote_matches(entry, headers):
+    # A header the server does not send cannot disprove the local copy; one that differs always does.
+    content_length = headers.get('Content-Length')
+    if content_length and not headers.get('Content-Encoding') and int(content_length) != entry['size']:
+        return False
+    etag = headers.get('ETag')
+    if etag and entry.get('etag') and etag != entry['etag']:
+        return False
+    return True
+
+
+def route_url(parsed_url):
+    """YTDLP, GDRIVE or GENERIC for a parsed URL, or None if it is not a supported video link."""
+    host = (parsed_url.hostname or '').lower()
+    while host:
+        handler = HOST_HANDLERS.get(host)
+        if handler:
+            return handler
+        host = host.partition('.')[2]
+    if os.path.splitext(parsed_url.path)[1].lower() in VIDEO_EXTENSIONS:
+        return GENERIC
+    return None
+
+
+def _preallocate(fileobj, size):
+    # Reserving the whole file up front lets the filesystem lay it out in a few contiguous extents instead of growing
+    # it chunk by chunk. Not available on every platform/filesystem, in which case the file simply grows as before.
+    if size <= 0:
+        return
+    try:
+        os.posix_fallocate(fileobj.fileno(), 0, size)
+    except (AttributeError, OSError):
+        pass
+
+
+def get_gdrive_credentials():
+    """Loads (refreshing or re-authorizing if needed) the Drive credentials once per process."""
+    global _cached_credentials
+    # Serialized so concurrent download threads do not refresh and rewrite the token file at the same time.
+    with _credentials_lock:
+        if _cached_credentials is not None and _cached_credentials.valid:
+            return _cached_credentials
+        _cached_credentials = _load_gdrive_credentials()
+        return _cached_credentials
+
+
+def _load_gdrive_credentials():
     creds = None
     if os.path.exists(GDRIVE_TOKEN_FILE):
         creds = Credentials.from_authorized_user_file(GDRIVE_TOKEN_FILE, SCOPES)
@@ -48,10 +262,17 @@ def get_gdrive_authenticated_service():
             with open(GDRIVE_TOKEN_FILE, 'w') as token:
                 token.write(creds.to_json())
             print(f"New Google Drive credentials saved to '{GDRIVE_TOKEN_FILE}'.")
+    return creds
+
 
+def get_gdrive_authenticated_service():
+    creds = get_gdrive_credentials()
     if creds:
         try:
-            service = build('drive', 'v3', credentials=creds)
+            # One persistent httplib2.Http per service keeps the TLS connection to googleapis.com alive across
+            # metadata and media requests. The discovery document ships with the client, so no fetch is needed.
+            authorized_http = AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS))
+            service = build('drive', 'v3', http=authorized_http, static_discovery=True, cache_discovery=False)
             return service
         except HttpError as error:
             print(f"An HTTP error occurred while building Google Drive service: {error}")
@@ -59,6 +280,14 @@ def get_gdrive_authenticated_service():
     return None
 
 
+def get_thread_gdrive_service():
+    service = getattr(_thread_state, 'gdrive_service', None)
+    if service is None:
+        service = get_gdrive_authenticated_service()
+        _thread_state.gdrive_service = service
+    return service
+
+
 def download_youtube_vimeo_etc(url: str, output_dir: str):
     print(f"  Attempting to download with yt-dlp: {url}")
     try:
@@ -76,23 +305,171 @@ def download_youtube_vimeo_etc(url: str, output_dir: str):
     return False
 
 
-def download_google_drive_video(service, url: str, output_dir: str):
-    print(f"  Attempting to download Google Drive video: {url}")
-    parsed_url = urlparse(url)
-    file_id = None
+def download_youtube_vimeo_etc_batch(urls, output_dir: str, manifest=None):
+    """Downloads all URLs with a single yt-dlp process and returns {url: downloaded}."""
+    print(f"  Attempting to download {len(urls)} URL(s) with one yt-dlp process")
+    downloaded_urls = set()
+    try:
+        command = [
+            'yt-dlp', '-a', '-', '-o', '%(title)s.%(ext)s', '-P', output_dir, '--no-part',
+            '-N', str(YTDLP_CONCURRENT_FRAGMENTS), '--no-abort-on-error',
+            # The manifest already skipped everything that is on disk and unchanged; whatever reaches yt-dlp is
+            # missing or was modified locally, so it is fetched again rather than reported as already downloaded.
+            '--force-overwrites',
+            # Echoes each input URL and its file once the file is in place, which is how per-URL success is reported.
+            '--print', 'after_move:%(original_url)s\t%(filepath)s',
+        ]
+        result = subprocess.run(command, input='\n'.join(urls) + '\n', stdout=subprocess.PIPE, text=True)
+        for line in result.stdout.splitlines():
+            url, _, filepath = line.strip().partition('\t')
+            downloaded_urls.add(url)
+            if manifest is not None and filepath and os.path.exists(filepath):
+                manifest.record(url, filepath)
+        if result.returncode != 0:
+            print(f"  yt-dlp exited with status {result.returncode}; some URLs failed.")
+    except FileNotFoundError:
+        print("  Error: yt-dlp command not found. Please ensure yt-dlp is installed and in your system's PATH.")
+    except Exception as e:
+        print(f"  An unexpected error occurred during yt-dlp download: {e}")
+
+    results = {}
+    for url in urls:
+        results[url] = url in downloaded_urls
+        if results[url]:
+            print(f"  Successfully downloaded: {url}")
+        else:
+            print(f"  Failed to download {url} with yt-dlp.")
+    return results
+
+
+def _stream_url_to_fifo(url, fifo_path):
+    ytdlp = subprocess.Popen(['yt-dlp', '-q', '-f', YTDLP_STREAM_MERGE_FORMAT, '-o', '-', url], stdout=subprocess.PIPE)
+    remux = subprocess.Popen([FFMPEG_PATH, '-hide_banner', '-v', 'error', '-i', 'pipe:0', '-c', 'copy',
+                              '-f', 'mpegts', '-y', fifo_path], stdin=ytdlp.stdout)
+    ytdlp.stdout.close()  # So yt-dlp sees SIGPIPE if the remux exits early.
+    remux.wait()
+    ytdlp.wait()
+    return remux.returncode == 0 and ytdlp.returncode == 0
+
+
+def _release_fifos(fifo_paths):
+    # Opening a FIFO for reading unblocks any writer still waiting on it; it then sees a closed pipe and exits.
+    for fifo_path in fifo_paths:
+        try:
+            os.close(os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK))
+        except OSError:
+            pass
+
 
+def stream_merge_videos(urls, output_path: str):
+    """
+    Streams each URL from yt-dlp through its own named pipe into a single FFmpeg concat, so only the merged video is
+    written to disk. Needs named pipes (POSIX), and the inputs must share codecs since the concat is a stream copy.
+    Returns {url: merged}.
+    """
+    if not hasattr(os, 'mkfifo'):
+        print("  Error: stream merging needs named pipes, which this platform does not support.")
+        return {url: False for url in urls}
+    print(f"  Stream-merging {len(urls)} URL(s) into {output_path}")
+
+    with tempfile.TemporaryDirectory(prefix='stream_merge_') as fifo_dir:
+        fifo_paths = []
+        for i in range(len(urls)):
+            fifo_path = os.path.join(fifo_dir, f"v_{i}.ts")
+            os.mkfifo(fifo_path)
+            fifo_paths.append(fifo_path)
+
+        failed_urls = set()
+        stop = threading.Event()
+
+        def feed():
+            # The concat demuxer opens its inputs in order, so each producer starts only after the previous one has
+            # been consumed; starting them all at once would leave most connections idle until their turn.
+            for url, fifo_path in zip(urls, fifo_paths):
+                if stop.is_set():
+                    failed_urls.add(url)
+                    continue
+                if not _stream_url_to_fifo(url, fifo_path):
+                    print(f"  Error streaming {url} with yt-dlp.")
+                    failed_urls.add(url)
+                    # The producer may never have opened the pipe; hand FFmpeg an empty input so it does not wait.
+                    try:
+                        os.close(os.open(fifo_path, os.O_WRONLY))
+                    except OSError:
+                        pass
+
+        merge_command = [
+            FFMPEG_PATH, '-hide_banner', '-v', 'error',
+            '-f', 'concat', '-safe', '0', '-protocol_whitelist', 'file,pipe', '-i', '-',
+            '-c', 'copy', '-movflags', '+faststart', '-y', output_path
+        ]
+        try:
+            merger = subprocess.Popen(merge_command, stdin=subprocess.PIPE, text=True)
+        except FileNotFoundError:
+            print(f"  Error: FFmpeg not found at {FFMPEG_PATH}.")
+            return {url: False for url in urls}
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        merger.communicate("".join(f"file '{fifo_path}'\n" for fifo_path in fifo_paths))
+        stop.set()
+        while feeder.is_alive():
+            _release_fifos(fifo_paths)
+            feeder.join(timeout=0.5)
+
+    merged = merger.returncode == 0 and not failed_urls
+    if merged:
+        print(f"  Successfully stream-merged {len(urls)} URL(s) into: {output_path}")
+    else:
+        print(f"  Stream merge into {output_path} failed (FFmpeg exit status {merger.returncode}).")
+    return {url: merged for url in urls}
+
+
+def extract_gdrive_file_id(url):
+    """The Drive file ID in a drive.google.com file link, or None (including for folder links)."""
+    parsed_url = urlparse(url)
     if 'drive.google.com' in parsed_url.netloc:
         if '/file/d/' in parsed_url.path:
-            match = re.search(r'/file/d/([a-zA-Z0-9_-]+)', parsed_url.path)
+            match = GDRIVE_FILE_ID_RE.search(parsed_url.path)
             if match:
-                file_id = match.group(1)
+                return match.group(1)
         elif '/open?id=' in parsed_url.query:
             query_params = parse_qs(parsed_url.query)
             if 'id' in query_params:
-                file_id = query_params['id'][0]
-        elif '/folders/' in parsed_url.path:
-            print("  Warning: This looks like a Google Drive folder link, not a file link. Skipping.")
-            return False
+                return query_params['id'][0]
+    return None
+
+
+def fetch_gdrive_metadata(service, file_ids):
+    """
+    {file_id: metadata} for many files using batched files.get calls, one round-trip per GDRIVE_BATCH_SIZE IDs
+    instead of one per file. IDs whose lookup fails are left out, so the download falls back to its own request.
+    """
+    metadata = {}
+
+    def on_response(request_id, response, exception):
+        if exception is None:
+            metadata[request_id] = response
+
+    file_ids = list(dict.fromkeys(file_ids))
+    for start in range(0, len(file_ids), GDRIVE_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for file_id in file_ids[start:start + GDRIVE_BATCH_SIZE]:
+            batch.add(service.files().get(fileId=file_id, fields=GDRIVE_METADATA_FIELDS), request_id=file_id)
+        try:
+            batch.execute()
+        except HttpError as error:
+            print(f"  Batched Google Drive metadata lookup failed: {error}")
+    return metadata
+
+
+def download_google_drive_video(service, url: str, output_dir: str, manifest=None, known_metadata=None):
+    print(f"  Attempting to download Google Drive video: {url}")
+    file_id = extract_gdrive_file_id(url)
+
+    if not file_id and '/folders/' in urlparse(url).path:
+        print("  Warning: This looks like a Google Drive folder link, not a file link. Skipping.")
+        return False
 
     if not file_id:
         print(f"  Could not extract Google Drive file ID from URL: {url}")
@@ -103,7 +480,9 @@ def download_google_drive_video(service, url: str, output_dir: str):
         return False
 
     try:
-        file_metadata = service.files().get(fileId=file_id, fields='name, mimeType').execute()
+        file_metadata = (known_metadata or {}).get(file_id)
+        if file_metadata is None:
+            file_metadata = service.files().get(fileId=file_id, fields=GDRIVE_METADATA_FIELDS).execute()
         file_name = file_metadata.get('name')
 
         if not file_name:
@@ -112,15 +491,31 @@ def download_google_drive_video(service, url: str, output_dir: str):
 
         destination_path = os.path.join(output_dir, file_name)
 
+        md5_checksum = file_metadata.get('md5Checksum')
+        if manifest is not None:
+            entry = manifest.get_local(url)
+            if entry and md5_checksum and entry.get('etag') == md5_checksum:
+                print(f"  Skipping Google Drive file {file_name}: unchanged since the last download.")
+                return True
+
         request = service.files().get_media(fileId=file_id)
-        fh = io.FileIO(destination_path, 'wb')
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-
-        while done is False:
-            status, done = downloader.next_chunk()
-            if status:
-                print(f"  Download Progress ({file_name}): {int(status.progress() * 100)}%")
+        raw_file = io.FileIO(destination_path, 'wb')
+        _preallocate(raw_file, int(file_metadata.get('size') or 0))
+        with _BackgroundWriter(io.BufferedWriter(raw_file, buffer_size=DOWNLOAD_WRITE_BUFFER_SIZE)) as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=GDRIVE_DOWNLOAD_CHUNK_SIZE)
+            next_chunk = downloader.next_chunk
+            done = False
+            last_reported = 0.0
+
+            while not done:
+                status, done = next_chunk()
+                if status:
+                    now = time.monotonic()
+                    if now - last_reported >= PROGRESS_INTERVAL_SECONDS:
+                        last_reported = now
+                        print(f"  Download Progress ({file_name}): {int(status.progress() * 100)}%")
+        if manifest is not None:
+            manifest.record(url, destination_path, etag=md5_checksum)
         print(f"  Successfully downloaded Google Drive file: {file_name}")
         return True
     except HttpError as error:
@@ -134,32 +529,210 @@ def download_google_drive_video(service, url: str, output_dir: str):
     return False
 
 
-def download_generic_video(url: str, output_dir: str):
-    print(f"  Attempting to download generic video: {url}")
-    try:
-        response = requests.get(url, stream=True)
+def _download_range(url, destination_path, start, end, chunk_size):
+    with _http_session.get(url, headers={'Range': f'bytes={start}-{end}'}, stream=True,
+                           timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS)) as response:
         response.raise_for_status()
-        if 'Content-Disposition' in response.headers:
-            fname_match = re.search(r'filename\*?=(?:UTF-8\'\')?([^;]+)', response.headers['Content-Disposition'])
-            if fname_match:
-                filename = fname_match.group(1).strip('\'"')
-            else:
-                filename = os.path.basename(urlparse(url).path)
+        if response.status_code != 206:
+            raise IOError(f"Server ignored the range request for bytes {start}-{end}")
+        with open(destination_path, 'r+b') as f:
+            f.seek(start)
+            response.raw.decode_content = True
+            shutil.copyfileobj(response.raw, f, length=chunk_size)
+
+
+def _download_striped(url, destination_path, total_size, connections, chunk_size):
+    # Each stripe writes at its own offset into a file that already has its final size.
+    with open(destination_path, 'wb') as f:
+        f.truncate(total_size)
+        _preallocate(f, total_size)
+    ranges = [(start, min(start + RANGE_STRIPE_SIZE, total_size) - 1)
+              for start in range(0, total_size, RANGE_STRIPE_SIZE)]
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        futures = [executor.submit(_download_range, url, destination_path, start, end, chunk_size)
+                   for start, end in ranges]
+        for future in futures:
+            future.result()
+
+
+def _filename_from_response(url, headers):
+    if 'Content-Disposition' in headers:
+        fname_match = CONTENT_DISPOSITION_FILENAME_RE.search(headers['Content-Disposition'])
+        if fname_match:
+            filename = fname_match.group(1).strip('\'"')
         else:
             filename = os.path.basename(urlparse(url).path)
+    else:
+        filename = os.path.basename(urlparse(url).path)
+
+    if not filename or '.' not in filename:
+        filename = f"downloaded_video_{os.urandom(4).hex()}.mp4"  # Fallback filename
+    return filename
+
 
-        if not filename or '.' not in filename:
-            filename = f"downloaded_video_{os.urandom(4).hex()}.mp4"  # Fallback filename
+def download_generic_video(url: str, output_dir: str, chunk_size: int = HTTP_DOWNLOAD_CHUNK_SIZE, connections: int = 1,
+                           manifest=None):
+    print(f"  Attempting to download generic video: {url}")
+    try:
+        entry = manifest.get_local(url) if manifest is not None else None
+        if entry:
+            head = _http_session.head(url, allow_redirects=True,
+                                      timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS))
+            if head.ok and _remote_matches(entry, head.headers):
+                print(f"  Skipping {url}: unchanged since the last download.")
+                return True
 
-        destination_path = os.path.join(output_dir, filename)
+        response = _http_session.get(url, stream=True,
+                                     timeout=(HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS))
+        response.raise_for_status()
+        destination_path = os.path.join(output_dir, _filename_from_response(url, response.headers))
 
-        with open(destination_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
+        total_size = int(response.headers.get('Content-Length') or 0)
+        ranges_supported = (response.headers.get('Accept-Ranges') == 'bytes'
+                            and not response.headers.get('Content-Encoding'))
+        if connections > 1 and ranges_supported and total_size > RANGE_STRIPE_SIZE:
+            response.close()
+            print(f"  Downloading {total_size} bytes over {connections} connections...")
+            _download_striped(url, destination_path, total_size, connections, chunk_size)
+        else:
+            # Copying straight from the raw stream skips iter_content's Python generator for every chunk.
+            response.raw.decode_content = True
+            destination_file = open(destination_path, 'wb', buffering=DOWNLOAD_WRITE_BUFFER_SIZE)
+            if not response.headers.get('Content-Encoding'):  # Content-Length is the decoded size only then
+                _preallocate(destination_file, total_size)
+            with _BackgroundWriter(destination_file) as f:
+                shutil.copyfileobj(response.raw, f, length=chunk_size)
+        if manifest is not None:
+            manifest.record(url, destination_path, etag=response.headers.get('ETag'))
         print(f"  Successfully downloaded generic video to: {destination_path}")
         return True
     except requests.exceptions.RequestException as e:
         print(f"  Error downloading generic video from {url}: {e}")
     except Exception as e:
         print(f"  An unexpected error occurred during generic download: {e}")
-    return False
\ No newline at end of file
+    return False
+
+
+async def _download_generic_video_async(session, semaphore, host_semaphore, url, output_dir, chunk_size, manifest):
+    async with semaphore, host_semaphore:
+        print(f"  Attempting to download generic video: {url}")
+        try:
+            entry = manifest.get_local(url) if manifest is not None else None
+            if entry:
+                async with session.head(url, allow_redirects=True) as head:
+                    if head.status < 400 and _remote_matches(entry, head.headers):
+                        print(f"  Skipping {url}: unchanged since the last download.")
+                        return True
+
+            async with session.get(url) as response:
+                response.raise_for_status()
+                destination_path = os.path.join(output_dir, _filename_from_response(url, response.headers))
+                # Buffered writes land in the page cache, so they are brief enough to issue from the event loop.
+                with open(destination_path, 'wb', buffering=DOWNLOAD_WRITE_BUFFER_SIZE) as f:
+                    if not response.headers.get('Content-Encoding'):
+                        _preallocate(f, response.content_length or 0)
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        f.write(chunk)
+                if manifest is not None:
+                    manifest.record(url, destination_path, etag=response.headers.get('ETag'))
+            print(f"  Successfully downloaded generic video to: {destination_path}")
+            return True
+        except aiohttp.ClientError as e:
+            print(f"  Error downloading generic video from {url}: {e}")
+        except Exception as e:
+            print(f"  An unexpected error occurred during generic download: {e}")
+    return False
+
+
+def download_generic_videos(urls, output_dir: str, chunk_size: int = HTTP_DOWNLOAD_CHUNK_SIZE,
+                            concurrency: int = GENERIC_DOWNLOAD_CONCURRENCY, per_host: int = None, manifest=None):
+    """
+    Downloads direct video links concurrently on one event loop, at most `concurrency` at a time (and `per_host` per
+    host), and returns {url: downloaded}. Coroutines cost far less memory than a thread per connection.
+    """
+    async def download_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        host_limit = per_host or concurrency
+        host_semaphores = {}
+        timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT_SECONDS, sock_read=HTTP_READ_TIMEOUT_SECONDS)
+        async with aiohttp.ClientSession(timeout=timeout, headers={'Accept-Encoding': 'identity'}) as session:
+            tasks = []
+            for url in urls:
+                host_semaphore = host_semaphores.setdefault(urlparse(url).netloc, asyncio.Semaphore(host_limit))
+                tasks.append(_download_generic_video_async(
+                    session, semaphore, host_semaphore, url, output_dir, chunk_size, manifest))
+            return await asyncio.gather(*tasks)
+
+    return dict(zip(urls, asyncio.run(download_all())))
+
+
+class DownloaderWorker:
+    """
+    The warm state of a download run: Drive credentials, the thread pool, per-host limits and the manifest. URLs can
+    be handed to it one at a time, e.g. by a long-running process reading stdin, without paying that start-up again.
+    """
+
+    def __init__(self, output_dir, max_workers=4, http_chunk_size=HTTP_DOWNLOAD_CHUNK_SIZE, connections=1,
+                 gdrive_available=None):
+        self.output_dir = os.path.abspath(output_dir)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.http_chunk_size = max(1, http_chunk_size)
+        self.connections = max(1, connections)
+        self.manifest = DownloadManifest(self.output_dir)
+        if gdrive_available is None:
+            gdrive_available = (os.path.exists(GDRIVE_CREDENTIALS_FILE)
+                                and get_gdrive_authenticated_service() is not None)
+        self.gdrive_available = gdrive_available
+        self.gdrive_metadata = {}
+        # Downloads are network-bound, so threads overlap the waiting; each thread builds its own Drive service.
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._host_semaphores = defaultdict(lambda: threading.Semaphore(PER_HOST_CONCURRENCY))
+        self._host_semaphores_lock = threading.Lock()
+
+    def prefetch_gdrive_metadata(self, urls):
+        """Looks up the metadata of every Drive file link in urls in batches, ahead of the downloads."""
+        if not self.gdrive_available:
+            return
+        file_ids = [file_id for file_id in map(extract_gdrive_file_id, urls) if file_id]
+        if file_ids:
+            self.gdrive_metadata.update(fetch_gdrive_metadata(get_thread_gdrive_service(), file_ids))
+
+    def _host_semaphore(self, netloc):
+        with self._host_semaphores_lock:
+            return self._host_semaphores[netloc]
+
+    def handle(self, url, parsed_url=None, handler=None):
+        """Downloads one URL on the calling thread and returns whether it succeeded."""
+        if parsed_url is None:
+            parsed_url = urlparse(url)
+            handler = route_url(parsed_url)
+        with self._host_semaphore(parsed_url.netloc):
+            if handler == YTDLP:
+                if self.manifest.get_local(url):
+                    print(f"  Skipping {url}: already downloaded.")
+                    return True
+                return download_youtube_vimeo_etc_batch([url], self.output_dir, self.manifest)[url]
+            elif handler == GDRIVE:
+                if self.gdrive_available:
+                    return download_google_drive_video(get_thread_gdrive_service(), url, self.output_dir,
+                                                       self.manifest, self.gdrive_metadata)
+                print("  Skipping Google Drive link: Google Drive API not authenticated.")
+            elif handler == GENERIC:
+                return download_generic_video(url, self.output_dir, self.http_chunk_size, self.connections,
+                                              self.manifest)
+            else:
+                print(f"  Warning: URL not recognized as a supported video platform or direct video link. Skipping: {url}")
+        return False
+
+    def submit(self, url, parsed_url=None, handler=None):
+        return self.executor.submit(self.handle, url, parsed_url, handler)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.manifest.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
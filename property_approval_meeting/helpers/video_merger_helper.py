@@ -1,61 +1,769 @@
 import os
+import json
+import re
 import subprocess
 import logging
 import shutil
+import struct
+import functools
+import heapq
+import collections
+import time
+import tempfile
+import threading
+import uuid
+from fractions import Fraction
+from concurrent.futures import ThreadPoolExecutor
+
+from . import media_cache_helper
 
 FFMPEG_PATH = r"C:\Users\Ankit.Anand\Downloads\ffmpeg\ffmpeg\bin\ffmpeg.exe"
 FFPROBE_PATH = r"C:\Users\Ankit.Anand\Downloads\ffmpeg\ffmpeg\bin\ffprobe.exe"
 
+# The concat list is fed on stdin, so 'file' has to be whitelisted alongside 'pipe'.
 FFMPEG_MERGE_COMMAND_TEMPLATE = [
     FFMPEG_PATH,
     '-f', 'concat',
     '-safe', '0',
-    '-i', '{concat_list_path}',
+    '-protocol_whitelist', 'file,pipe',
+    '-i', '-',
     '-c', 'copy',
+    '-movflags', '+faststart',
     '-y',
     '{output_path}'
 ]
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(levelname)s - %(message)s',
-                    handlers=[
-                        logging.FileHandler("master_video_maker.log"),
-                        logging.StreamHandler()
-                    ])
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.webm', '.avi', '.mkv', '.flv')
+VIDEO_SUFFIX_SET = frozenset(ext.lstrip('.') for ext in VIDEO_EXTENSIONS)
+
+# Target profile used when inputs differ and have to be re-encoded (matches convert_pptx_to_video defaults).
+MERGE_TARGET_WIDTH = 1920
+MERGE_TARGET_HEIGHT = 1080
+MERGE_TARGET_FRAME_RATE = 30
+MERGE_TARGET_SAMPLE_RATE = 48000
+
+# Encoder settings for the re-encode fallback. Callers running several merges at once should pass
+# ffmpeg_threads=cpu_count // workers to avoid oversubscribing the CPU.
+FFMPEG_THREADS = os.cpu_count() or 1
+FFMPEG_PRESET = "ultrafast"
+
+# FFmpeg stderr is streamed rather than buffered; only this many trailing lines are kept for error reports.
+FFMPEG_STDERR_TAIL_LINES = 50
+FFMPEG_PROGRESS_LOG_INTERVAL_SECONDS = 10
+FFMPEG_LINE_BREAK_RE = re.compile(rb'[\r\n]')
+
+# MP4/MOV inputs are probed by reading their moov box directly; anything the parser is unsure of goes to ffprobe.
+MP4_FAST_PROBE_EXTENSIONS = ('.mp4', '.m4v', '.mov')
+MP4_MOOV_MAX_BYTES = 64 * 1024 * 1024
+# Profiles whose SPS the fast probe understands: baseline, main and extended are always 8-bit 4:2:0, high is checked.
+H264_FAST_PROBE_PROFILES = frozenset((66, 77, 88, 100))
+# Table E-1 of the H.264 spec: aspect_ratio_idc -> sample aspect ratio.
+H264_SAMPLE_ASPECT_RATIOS = (None, (1, 1), (12, 11), (10, 11), (16, 11), (40, 33), (24, 11), (20, 11), (32, 11),
+                             (80, 33), (18, 11), (15, 11), (64, 33), (160, 99), (4, 3), (3, 2), (2, 1))
+AAC_SAMPLE_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000, 11025, 8000, 7350)
+
+# Inputs are probed concurrently before the merge; each probe is mostly waiting on ffprobe or the disk.
+PROBE_CONCURRENCY = 16
+
+# Hardware H.264 encoders tried, in order, before falling back to libx264.
+HARDWARE_H264_ENCODERS = ('h264_nvenc', 'h264_qsv')
+
 logger = logging.getLogger(__name__)
 
-def get_video_duration(video_path):
+# (path, size, mtime_ns) -> probe result; re-merging a folder only probes new or changed files. ffprobe results are
+# also kept in the media cache, so later runs skip ffprobe for unchanged files too.
+_probe_cache = {}
+
+
+def _iter_boxes(data, start, end):
+    """Yields (type, body_start, body_end) for the ISO BMFF boxes laid out in data[start:end]."""
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_box(data, start, end, *path):
+    for box_type in path:
+        for child_type, child_start, child_end in _iter_boxes(data, start, end):
+            if child_type == box_type:
+                start, end = child_start, child_end
+                break
+        else:
+            return None
+    return start, end
+
+
+def _read_moov(video_path):
+    # Walks the top-level boxes with seeks, so a moov at the end of a large file costs a handful of small reads.
+    with open(video_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            size, box_type = struct.unpack_from('>I4s', header)
+            header_size = 8
+            if size == 1 and len(header) == 16:
+                size = struct.unpack_from('>Q', header, 8)[0]
+                header_size = 16
+            elif size == 0:
+                size = file_size - offset
+            if size < header_size:
+                return None
+            if box_type == b'moov':
+                if size > MP4_MOOV_MAX_BYTES:
+                    return None
+                f.seek(offset + header_size)
+                return f.read(size - header_size)
+            offset += size
+    return None
+
+
+def _media_header(data, start):
+    """(timescale, duration) from an mvhd or mdhd body."""
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+
+def _read_descriptor(data, offset):
+    # MPEG-4 descriptors: one tag byte, then a length of up to four 7-bit groups.
+    tag = data[offset]
+    offset += 1
+    length = 0
+    for _ in range(4):
+        byte = data[offset]
+        offset += 1
+        length = (length << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            break
+    return tag, offset, offset + length
+
+
+def _aac_stream(data, start, end):
+    """Audio stream dict for an mp4a sample entry, or None unless it is plain AAC-LC with an explicit layout."""
+    if struct.unpack_from('>H', data, start + 8)[0] != 0:
+        return None  # QuickTime v1/v2 sound descriptions carry extra fields.
+    esds = _find_box(data, start + 28, end, b'esds')
+    if esds is None:
+        return None
+    tag, offset, descriptor_end = _read_descriptor(data, esds[0] + 4)
+    if tag != 0x03:
+        return None
+    flags = data[offset + 2]
+    offset += 3
+    if flags & 0x80:
+        offset += 2
+    if flags & 0x40:
+        offset += 1 + data[offset]
+    if flags & 0x20:
+        offset += 2
+    tag, offset, _ = _read_descriptor(data, offset)
+    if tag != 0x04 or data[offset] != 0x40:
+        return None
+    tag, offset, _ = _read_descriptor(data, offset + 13)
+    if tag != 0x05:
+        return None
+    object_type = data[offset] >> 3
+    frequency_index = ((data[offset] & 0x07) << 1) | (data[offset + 1] >> 7)
+    channels = (data[offset + 1] >> 3) & 0x0F
+    # HE-AAC and explicit frequencies report rates ffprobe derives differently; leave those to ffprobe.
+    if object_type != 2 or frequency_index >= len(AAC_SAMPLE_RATES) or not channels:
+        return None
+    return {'codec_type': 'audio', 'codec_name': 'aac',
+            'sample_rate': str(AAC_SAMPLE_RATES[frequency_index]), 'channels': channels}
+
+
+class _BitReader:
+    """MSB-first reader over an H.264 RBSP, with the Exp-Golomb codes the SPS uses."""
+
+    def __init__(self, data):
+        self.data = data
+        self.position = 0
+
+    def bits(self, count):
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.position >> 3]  # IndexError past the end is handled by the caller.
+            value = (value << 1) | ((byte >> (7 - (self.position & 7))) & 1)
+            self.position += 1
+        return value
+
+    def ue(self):
+        leading_zeros = 0
+        while not self.bits(1):
+            leading_zeros += 1
+            if leading_zeros > 31:
+                raise ValueError("Invalid Exp-Golomb code")
+        return (1 << leading_zeros) - 1 + self.bits(leading_zeros)
+
+    def se(self):
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def _parse_h264_sps(nal):
+    """
+    (full_range, sample_aspect_ratio) from an SPS NAL unit, or None if it is not 8-bit 4:2:0. sample_aspect_ratio
+    is an (h, v) tuple or None when the SPS does not signal one.
+    """
+    # Drop the emulation-prevention byte from every 00 00 03 sequence to get the raw bitstream.
+    rbsp = bytearray()
+    zeros = 0
+    for byte in nal[1:]:
+        if zeros >= 2 and byte == 3:
+            zeros = 0
+            continue
+        rbsp.append(byte)
+        zeros = zeros + 1 if byte == 0 else 0
+    reader = _BitReader(rbsp)
+    profile_idc = reader.bits(8)
+    reader.bits(16)  # constraint flags, level_idc
+    reader.ue()  # seq_parameter_set_id
+    if profile_idc in (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135):
+        chroma_format_idc = reader.ue()
+        if chroma_format_idc != 1 or reader.ue() or reader.ue():  # 4:2:0 with 8-bit luma and chroma only.
+            return None
+        reader.bits(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.bits(1):  # seq_scaling_matrix_present_flag
+            for i in range(8):
+                if reader.bits(1):
+                    last_scale = next_scale = 8
+                    for _ in range(16 if i < 6 else 64):
+                        if next_scale:
+                            next_scale = (last_scale + reader.se() + 256) % 256
+                        last_scale = next_scale or last_scale
+    reader.ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.ue()
+    if pic_order_cnt_type == 0:
+        reader.ue()
+    elif pic_order_cnt_type == 1:
+        reader.bits(1)
+        reader.se()
+        reader.se()
+        for _ in range(reader.ue()):
+            reader.se()
+    reader.ue()  # max_num_ref_frames
+    reader.bits(1)  # gaps_in_frame_num_value_allowed_flag
+    reader.ue()  # pic_width_in_mbs_minus1
+    reader.ue()  # pic_height_in_map_units_minus1
+    if not reader.bits(1):  # frame_mbs_only_flag
+        reader.bits(1)
+    reader.bits(1)  # direct_8x8_inference_flag
+    if reader.bits(1):  # frame_cropping_flag
+        for _ in range(4):
+            reader.ue()
+    full_range = False
+    sample_aspect_ratio = None
+    if reader.bits(1):  # vui_parameters_present_flag
+        if reader.bits(1):  # aspect_ratio_info_present_flag
+            aspect_ratio_idc = reader.bits(8)
+            if aspect_ratio_idc == 255:
+                sample_aspect_ratio = (reader.bits(16), reader.bits(16))
+            elif aspect_ratio_idc < len(H264_SAMPLE_ASPECT_RATIOS):
+                sample_aspect_ratio = H264_SAMPLE_ASPECT_RATIOS[aspect_ratio_idc]
+            else:
+                return None
+        if reader.bits(1):  # overscan_info_present_flag
+            reader.bits(1)
+        if reader.bits(1):  # video_signal_type_present_flag
+            reader.bits(3)  # video_format
+            full_range = bool(reader.bits(1))
+    return full_range, sample_aspect_ratio
+
+
+def _h264_stream(data, start, end, frame_rate):
+    """
+    Video stream dict for an avc1/avc3 sample entry, or None unless it is limited-range 8-bit yuv420p. Full-range
+    streams are left to ffprobe, which reports them as yuvj420p.
+    """
+    width, height = struct.unpack_from('>HH', data, start + 24)
+    avcc = _find_box(data, start + 78, end, b'avcC')
+    if avcc is None or data[avcc[0] + 1] not in H264_FAST_PROBE_PROFILES or not data[avcc[0] + 5] & 0x1F:
+        return None
+    sps_length = struct.unpack_from('>H', data, avcc[0] + 6)[0]
+    sps = _parse_h264_sps(data[avcc[0] + 8:avcc[0] + 8 + sps_length])
+    if sps is None:
+        return None
+    full_range, sample_aspect_ratio = sps
+    colr = _find_box(data, start + 78, end, b'colr')
+    if colr is not None and data[colr[0]:colr[0] + 4] == b'nclx' and data[colr[0] + 10] & 0x80:
+        full_range = True
+    if full_range:
+        return None
+    stream = {'codec_type': 'video', 'codec_name': 'h264', 'width': width, 'height': height,
+              'avg_frame_rate': f"{frame_rate.numerator}/{frame_rate.denominator}", 'pix_fmt': 'yuv420p'}
+    # Like ffprobe, a container pasp box takes precedence over the aspect ratio in the SPS.
+    pasp = _find_box(data, start + 78, end, b'pasp')
+    if pasp is not None:
+        sample_aspect_ratio = struct.unpack_from('>II', data, pasp[0])
+    if sample_aspect_ratio is not None:
+        stream['sample_aspect_ratio'] = f"{sample_aspect_ratio[0]}:{sample_aspect_ratio[1]}"
+    return stream
+
+
+def _fast_probe_mp4(video_path):
+    """
+    Reads codec parameters and duration straight from an MP4/MOV moov box instead of starting ffprobe. Only H.264
+    video and AAC-LC audio are recognised; returns None for anything else, and for any file it cannot parse, so the
+    caller falls back to ffprobe.
+    """
+    try:
+        moov = _read_moov(video_path)
+        if not moov:
+            return None
+        mvhd = _find_box(moov, 0, len(moov), b'mvhd')
+        if mvhd is None:
+            return None
+        timescale, duration = _media_header(moov, mvhd[0])
+        if not timescale or not duration:
+            return None  # Fragmented files keep their duration outside the moov.
+        video_stream = audio_stream = None
+        for box_type, trak_start, trak_end in _iter_boxes(moov, 0, len(moov)):
+            if box_type != b'trak':
+                continue
+            mdia = _find_box(moov, trak_start, trak_end, b'mdia')
+            hdlr = mdia and _find_box(moov, *mdia, b'hdlr')
+            if hdlr is None:
+                return None
+            handler_type = moov[hdlr[0] + 8:hdlr[0] + 12]
+            if handler_type not in (b'vide', b'soun') or (video_stream if handler_type == b'vide' else audio_stream):
+                continue
+            mdhd = _find_box(moov, *mdia, b'mdhd')
+            stbl = _find_box(moov, *mdia, b'minf', b'stbl')
+            stsd = stbl and _find_box(moov, *stbl, b'stsd')
+            if mdhd is None or stsd is None:
+                return None
+            entry_type, entry_start, entry_end = next(_iter_boxes(moov, stsd[0] + 8, stsd[1]), (None, 0, 0))
+            if handler_type == b'soun':
+                audio_stream = _aac_stream(moov, entry_start, entry_end) if entry_type == b'mp4a' else None
+                if audio_stream is None:
+                    return None
+                continue
+            media_timescale, media_duration = _media_header(moov, mdhd[0])
+            stts = _find_box(moov, *stbl, b'stts')
+            if entry_type not in (b'avc1', b'avc3') or stts is None or not media_duration:
+                return None
+            entry_count = struct.unpack_from('>I', moov, stts[0] + 4)[0]
+            sample_count = sum(struct.unpack_from('>I', moov, stts[0] + 8 + 8 * i)[0] for i in range(entry_count))
+            video_stream = _h264_stream(moov, entry_start, entry_end,
+                                        Fraction(sample_count * media_timescale, media_duration))
+            if video_stream is None:
+                return None
+        if video_stream is None:
+            return None
+        return video_stream, audio_stream, duration / timescale
+    except (OSError, struct.error, IndexError, ValueError, ZeroDivisionError):
+        return None
+
+
+def _probe_video(video_path):
+    """
+    One ffprobe call per file for everything the merge needs: returns (video_stream, audio_stream, duration), any of
+    which may be None.
+    """
+    try:
+        stat_result = os.stat(video_path)
+        cache_key = (os.path.abspath(video_path), stat_result.st_size, stat_result.st_mtime_ns)
+    except OSError:
+        cache_key = None
+    if cache_key in _probe_cache:
+        return _probe_cache[cache_key]
+    if video_path.lower().endswith(MP4_FAST_PROBE_EXTENSIONS):
+        fast_result = _fast_probe_mp4(video_path)
+        if fast_result is not None:
+            if cache_key is not None:
+                _probe_cache[cache_key] = fast_result
+            return fast_result
+    if cache_key is not None:
+        cached_result = media_cache_helper.get_cached_probe(*cache_key)
+        if cached_result is not None:
+            _probe_cache[cache_key] = tuple(cached_result)
+            return _probe_cache[cache_key]
     try:
         ffprobe_command = [
             FFPROBE_PATH,
             '-v', 'error',
-            '-show_entries', 'format=duration',
-            '-of', 'default=noprint_wrappers=1:nokey=1',
+            '-show_entries',
+            'stream=index,codec_type,codec_name,width,height,sample_aspect_ratio,avg_frame_rate,pix_fmt,sample_rate,channels'
+            ':format=duration',
+            '-of', 'json',
             video_path
         ]
-        result = subprocess.run(ffprobe_command, capture_output=True, text=True, check=True)
-        duration = float(result.stdout.strip())
-        return duration
+        # Binary pipes: json parses the bytes directly, and stderr is only decoded if it gets logged.
+        result = subprocess.run(ffprobe_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        probe = json.loads(result.stdout)
     except FileNotFoundError:
         logger.error(f"FFprobe executable not found at '{FFPROBE_PATH}'. Please ensure the path is correct.")
-        return None
+        return None, None, None
     except subprocess.CalledProcessError as e:
-        logger.error(f"FFprobe failed for {video_path}: {e.stderr}")
-        return None
+        logger.error(f"FFprobe failed for {video_path}: {e.stderr.decode('utf-8', 'replace')}")
+        return None, None, None
     except Exception as e:
-        logger.error(f"An unexpected error occurred getting duration for {video_path}: {e}")
+        logger.error(f"An unexpected error occurred probing {video_path}: {e}")
+        return None, None, None
+    streams = probe.get('streams', [])
+    video_stream = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio_stream = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    try:
+        duration = float(probe.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        logger.error(f"FFprobe reported no duration for {video_path}")
+        duration = None
+    if cache_key is not None:
+        _probe_cache[cache_key] = (video_stream, audio_stream, duration)
+        media_cache_helper.store_cached_probe(*cache_key, _probe_cache[cache_key])
+    return video_stream, audio_stream, duration
+
+
+def probe_videos(video_files, max_workers=PROBE_CONCURRENCY):
+    """Probes every input at once and fills the probe cache, so the later per-file lookups return immediately."""
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(video_files)))) as executor:
+        return dict(zip(video_files, executor.map(_probe_video, video_files)))
+
+
+def get_video_duration(video_path):
+    return _probe_video(video_path)[2]
+
+
+def get_video_stream_info(video_path):
+    """Returns (video_stream, audio_stream) dicts; either may be None. Shares its ffprobe call with the duration."""
+    return _probe_video(video_path)[:2]
+
+
+def _encoder_works(encoder):
+    # Builds often list NVENC/QSV without a usable GPU behind them, so encode one test frame to be sure.
+    test_command = [
+        FFMPEG_PATH, '-hide_banner', '-v', 'error',
+        '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+        '-frames:v', '1', '-c:v', encoder, '-f', 'null', '-'
+    ]
+    try:
+        return subprocess.run(test_command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                              timeout=30).returncode == 0
+    except (OSError, subprocess.SubprocessError):
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def select_h264_encoder():
+    """First working hardware H.264 encoder, else libx264. Probed once per process."""
+    try:
+        result = subprocess.run([FFMPEG_PATH, '-hide_banner', '-encoders'], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, timeout=30)
+        available = result.stdout.decode('ascii', 'replace')
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not list FFmpeg encoders, using libx264: {e}")
+        return 'libx264'
+    for encoder in HARDWARE_H264_ENCODERS:
+        if f" {encoder} " in available and _encoder_works(encoder):
+            logger.info(f"Using hardware H.264 encoder: {encoder}")
+            return encoder
+    return 'libx264'
+
+
+def _video_encoder_args(encoder, preset):
+    if encoder == 'h264_nvenc':
+        return ['-c:v', 'h264_nvenc', '-preset', 'p4', '-rc', 'vbr', '-cq', '23', '-b:v', '0']
+    if encoder == 'h264_qsv':
+        return ['-c:v', 'h264_qsv', '-global_quality', '23']
+    return ['-c:v', 'libx264', '-preset', preset]
+
+
+def _hwaccel_input_args(encoder):
+    # Decode on the same GPU that encodes. Frames are copied back to system memory for the CPU filter chain, and
+    # FFmpeg falls back to software decoding for any input the GPU decoder cannot handle.
+    if encoder == 'h264_nvenc':
+        return ['-hwaccel', 'cuda']
+    if encoder == 'h264_qsv':
+        return ['-hwaccel', 'qsv']
+    # libx264 still benefits from whatever decoder the machine has (NVDEC, VAAPI, DXVA2, VideoToolbox).
+    return ['-hwaccel', 'auto']
+
+
+def _frame_rate(video_stream):
+    """Exact frame rate from ffprobe's 'num/den' string (e.g. '30000/1001'), or None if unknown."""
+    try:
+        return Fraction(video_stream.get('avg_frame_rate') or '0/0')
+    except (ValueError, ZeroDivisionError):
         return None
 
 
-def merge_videos_in_folder(input_folder: str, output_filename: str) -> bool:
+def _sample_aspect_ratio(video_stream):
+    # ffprobe reports square pixels as '1:1', '0:1' (unset) or 'N/A', and a parsed MP4 without one reports nothing.
+    # Other ratios are reduced so '8:6' and '4:3' compare equal.
+    try:
+        h_spacing, v_spacing = map(int, video_stream.get('sample_aspect_ratio').split(':'))
+        sample_aspect_ratio = Fraction(h_spacing, v_spacing)
+    except (AttributeError, ValueError, ZeroDivisionError):
+        return '1:1'
+    if not sample_aspect_ratio:
+        return '1:1'
+    return f"{sample_aspect_ratio.numerator}:{sample_aspect_ratio.denominator}"
+
+
+def _stream_signature(video_stream, audio_stream):
+    """Parameters that must be identical across inputs for a stream-copy concat to be valid."""
+    video_part = (video_stream.get('codec_name'), video_stream.get('width'), video_stream.get('height'),
+                  _sample_aspect_ratio(video_stream), _frame_rate(video_stream), video_stream.get('pix_fmt'))
+    audio_part = tuple(audio_stream.get(key) for key in ('codec_name', 'sample_rate', 'channels')) if audio_stream else None
+    return video_part, audio_part
+
+
+def _video_filter_chain(video_stream):
+    """Only the normalization steps this input actually needs; an already-conforming input passes straight through."""
+    steps = []
+    if (video_stream.get('width'), video_stream.get('height')) != (MERGE_TARGET_WIDTH, MERGE_TARGET_HEIGHT):
+        steps.append(f"scale={MERGE_TARGET_WIDTH}:{MERGE_TARGET_HEIGHT}:force_original_aspect_ratio=decrease")
+        steps.append(f"pad={MERGE_TARGET_WIDTH}:{MERGE_TARGET_HEIGHT}:(ow-iw)/2:(oh-ih)/2")
+    if steps or _sample_aspect_ratio(video_stream) != '1:1':
+        steps.append("setsar=1")
+    if _frame_rate(video_stream) != MERGE_TARGET_FRAME_RATE:
+        steps.append(f"fps={MERGE_TARGET_FRAME_RATE}")
+    if video_stream.get('pix_fmt') != 'yuv420p':
+        steps.append("format=yuv420p")
+    return ','.join(steps) or 'null'
+
+
+def _build_reencode_command(video_files, stream_infos, durations, output_filename,
+                            ffmpeg_threads=FFMPEG_THREADS, preset=FFMPEG_PRESET, hwaccel=True):
+    """Concat filter graph that scales/pads every input to the target profile; used when stream copy is unsafe."""
+    # The per-input scale/pad/fps chains are real work too; let the filter graph use the same thread budget.
+    encoder = select_h264_encoder()
+    command = [FFMPEG_PATH, '-filter_complex_threads', str(ffmpeg_threads)]
+    for video_path in video_files:
+        command += [*(_hwaccel_input_args(encoder) if hwaccel else []), '-i', video_path]
+    filters = []
+    concat_inputs = []
+    for i, (video_stream, audio_stream) in enumerate(stream_infos):
+        filters.append(f"[{i}:v]{_video_filter_chain(video_stream or {})}[v{i}]")
+        if audio_stream:
+            filters.append(f"[{i}:a]aresample={MERGE_TARGET_SAMPLE_RATE},aformat=channel_layouts=stereo[a{i}]")
+        else:
+            # Silent track so every segment has audio for the concat filter.
+            filters.append(f"anullsrc=channel_layout=stereo:sample_rate={MERGE_TARGET_SAMPLE_RATE},"
+                           f"atrim=duration={durations.get(video_files[i]) or 0}[a{i}]")
+        concat_inputs.append(f"[v{i}][a{i}]")
+    filters.append(f"{''.join(concat_inputs)}concat=n={len(video_files)}:v=1:a=1[v][a]")
+    command += [
+        '-filter_complex', ';'.join(filters),
+        '-map', '[v]', '-map', '[a]',
+        *_video_encoder_args(encoder, preset),
+        '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac',
+        '-movflags', '+faststart',
+        '-threads', str(ffmpeg_threads),
+        '-y', output_filename
+    ]
+    return command
+
+
+def _concat_list_entry(video_path):
+    # The concat demuxer reads single-quoted paths; an apostrophe has to close the quote, be escaped, and reopen it.
+    path = os.path.abspath(video_path).replace(os.sep, '/').replace("'", "'\\''")
+    return f"file '{path}'\n"
+
+
+def _has_line_break(video_path):
+    return '\n' in video_path or '\r' in video_path
+
+
+def _concat_safe_inputs(video_files, work_dir):
+    """
+    The concat list is line-based and has no escape for line breaks, so inputs whose path contains one are
+    hardlinked into work_dir under a plain name first.
+    """
+    safe_files = []
+    for i, video_path in enumerate(video_files):
+        if _has_line_break(video_path):
+            link_path = os.path.join(work_dir, f"input{i}{os.path.splitext(video_path)[1]}")
+            try:
+                os.link(video_path, link_path)
+            except OSError:
+                shutil.copy2(video_path, link_path)
+            video_path = link_path
+        safe_files.append(video_path)
+    return safe_files
+
+
+def _run_ffmpeg(command, stdin_text=None):
+    """
+    Runs FFmpeg, reading stderr in binary chunks so memory stays bounded and only the lines that are logged get
+    decoded. Returns (returncode, stderr_tail).
+    """
+    tail = collections.deque(maxlen=FFMPEG_STDERR_TAIL_LINES)
+    last_progress_log = 0.0
+    with subprocess.Popen(command,
+                          stdin=subprocess.PIPE if stdin_text is not None else subprocess.DEVNULL,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE) as process:
+        if stdin_text is not None:
+            try:
+                # One encoded blob, one write.
+                process.stdin.write(stdin_text.encode('utf-8'))
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # FFmpeg exited early; its stderr explains why.
+        pending = b''
+        for chunk in iter(lambda: process.stderr.read1(65536), b''):
+            # Progress updates are terminated by '\r', the rest by '\n'.
+            *lines, pending = FFMPEG_LINE_BREAK_RE.split(pending + chunk)
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith((b'frame=', b'size=')):
+                    now = time.monotonic()
+                    if now - last_progress_log >= FFMPEG_PROGRESS_LOG_INTERVAL_SECONDS:
+                        last_progress_log = now
+                        logger.info(f"FFmpeg progress: {line.decode('utf-8', 'replace')}")
+                    continue
+                tail.append(line)
+        if pending.strip():
+            tail.append(pending.strip())
+    return process.returncode, "\n".join(line.decode('utf-8', 'replace') for line in tail)
+
+
+def _stream_copy_pair(pair, output_path):
+    command = [FFMPEG_PATH, '-f', 'concat', '-safe', '0', '-protocol_whitelist', 'file,pipe', '-i', '-',
+               '-c', 'copy', '-y', output_path]
+    try:
+        returncode, stderr_tail = _run_ffmpeg(command, "".join(_concat_list_entry(path) for path in pair))
+    except OSError as e:
+        logger.error(f"Pairwise stream copy into {output_path} failed: {e}")
+        return False
+    if returncode != 0:
+        logger.error(f"Pairwise stream copy into {output_path} failed:\n{stderr_tail}")
+    return returncode == 0
+
+
+def _reencode_audio_batch(pairs, threads):
+    """
+    One FFmpeg process for several (input, output) pairs, so process and codec start-up is paid once per batch.
+    Inputs without audio get a silent track of their own duration.
+    """
+    command = [FFMPEG_PATH, '-y']
+    maps = []
+    input_count = 0
+    for video_path, _ in pairs:
+        command += ['-threads', str(threads), '-i', video_path]
+        video_input = input_count
+        input_count += 1
+        if get_video_stream_info(video_path)[1] is None:
+            command += ['-f', 'lavfi', '-t', f"{get_video_duration(video_path):.3f}",
+                        '-i', f"anullsrc=channel_layout=stereo:sample_rate={MERGE_TARGET_SAMPLE_RATE}"]
+            audio_input = input_count
+            input_count += 1
+        else:
+            audio_input = video_input
+        maps.append((video_input, audio_input))
+    for (video_input, audio_input), (_, output_path) in zip(maps, pairs):
+        command += ['-map', f'{video_input}:v:0', '-map', f'{audio_input}:a:0',
+                    '-c:v', 'copy', '-c:a', 'aac', '-ar', str(MERGE_TARGET_SAMPLE_RATE), '-ac', '2',
+                    '-threads', str(threads), output_path]
+    batch_label = ", ".join(os.path.basename(video_path) for video_path, _ in pairs)
+    try:
+        returncode, stderr_tail = _run_ffmpeg(command)
+    except OSError as e:
+        logger.error(f"Audio re-encode of {batch_label} failed: {e}")
+        return False
+    if returncode != 0:
+        logger.error(f"Audio re-encode of {batch_label} failed:\n{stderr_tail}")
+    return returncode == 0
+
+
+def _reencode_audio_tracks(video_files, work_dir, max_workers, ffmpeg_threads=FFMPEG_THREADS):
+    """
+    Brings every input's audio to AAC at the target rate while stream-copying its video, so inputs that differ only
+    in audio can still be concatenated without touching the video. Returns the new files, or None on failure.
+    """
+    workers = max(1, min(max_workers, len(video_files)))
+    # Split the thread budget so the concurrent FFmpeg processes together use about ffmpeg_threads cores.
+    threads_per_job = max(1, ffmpeg_threads // workers)
+    pairs = [(video_path, os.path.join(work_dir, f"audio{i}.mkv")) for i, video_path in enumerate(video_files)]
+    # Longest inputs first, each to the batch with the least audio so far, so the workers finish together instead of
+    # one batch of long files holding up the merge.
+    batches = [[] for _ in range(workers)]
+    heap = [(0.0, k) for k in range(workers)]
+    for pair in sorted(pairs, key=lambda pair: get_video_duration(pair[0]) or 0.0, reverse=True):
+        load, k = heapq.heappop(heap)
+        batches[k].append(pair)
+        heapq.heappush(heap, (load + (get_video_duration(pair[0]) or 0.0), k))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if not all(executor.map(lambda batch: _reencode_audio_batch(batch, threads_per_job), batches)):
+            return None
+    return [output_path for _, output_path in pairs]
+
+
+def _reduce_pairwise(video_files, work_dir, max_workers):
+    """
+    Halves the input list with parallel two-file stream-copy concats until two files remain, so several FFmpeg
+    processes share the disk bandwidth. Returns the remaining files, or None if any step failed.
+    """
+    round_number = 0
+    while len(video_files) > 2:
+        next_files, jobs = [], []
+        for k in range(0, len(video_files), 2):
+            pair = video_files[k:k + 2]
+            if len(pair) == 1:
+                next_files.append(pair[0])
+                continue
+            # Matroska accepts any codec the inputs share, whatever their original containers.
+            output_path = os.path.join(work_dir, f"round{round_number}_{k // 2}.mkv")
+            next_files.append(output_path)
+            jobs.append((pair, output_path))
+        logger.info(f"Pairwise merge round {round_number + 1}: {len(jobs)} stream copies.")
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as executor:
+            if not all(executor.map(lambda job: _stream_copy_pair(*job), jobs)):
+                return None
+        video_files = next_files
+        round_number += 1
+    return video_files
+
+
+def _discard_work_dir(work_dir):
+    """
+    Moves the merge's scratch folder aside and deletes it on a background thread, so the caller does not wait on
+    removing gigabytes of intermediates. Not a daemon thread: the interpreter finishes the delete before exiting.
+    """
+    trash_dir = f"{work_dir}.trash_{uuid.uuid4().hex}"
+    try:
+        os.rename(work_dir, trash_dir)
+    except OSError:
+        trash_dir = work_dir
+    threading.Thread(target=shutil.rmtree, args=(trash_dir,), kwargs={'ignore_errors': True},
+                     name='merge-work-dir-cleanup').start()
+
+
+def _replace_output(output_filename):
+    # The previous output may be a hardlink to one of the inputs; writing through it would overwrite that input.
+    if os.path.exists(output_filename):
+        os.remove(output_filename)
+
+
+def merge_videos_in_folder(input_folder: str, output_filename: str,
+                           ffmpeg_threads: int = FFMPEG_THREADS, preset: str = FFMPEG_PRESET,
+                           parallel_merge: bool = False) -> bool:
     logger.info(f"Starting video merge process for folder: {input_folder}")
     logger.info(f"Output video will be named: {os.path.basename(output_filename)}")
 
+    # scandir reports the entry type from the directory listing, so there is no stat() per file.
     video_files = []
-    for item in os.listdir(input_folder):
-        item_path = os.path.join(input_folder, item)
-        if os.path.isfile(item_path) and (item.lower().endswith(('.mp4', '.mov', '.webm', '.avi', '.mkv', '.flv'))):
-            video_files.append(item_path)
+    with os.scandir(input_folder) as entries:
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False) and entry.name.rpartition('.')[2].lower() in VIDEO_SUFFIX_SET:
+                video_files.append(entry.path)
 
     if not video_files:
         logger.warning(f"No video files found in '{input_folder}' to merge.")
@@ -67,10 +775,15 @@ def merge_videos_in_folder(input_folder: str, output_filename: str) -> bool:
             logger.info(f"Input and output are the same file. Skipping merge.")
             return True
         else:
-            logger.warning(f"Only one video found. Copying it to the output location.")
+            logger.warning(f"Only one video found. Linking it to the output location instead of running FFmpeg.")
             try:
-                shutil.copyfile(source_video, output_filename)
-                logger.info(f"Successfully copied single video to: {output_filename}")
+                _replace_output(output_filename)
+                try:
+                    os.link(source_video, output_filename)
+                except OSError:
+                    # Different filesystem (or no hardlink support): fall back to a real copy.
+                    shutil.copy2(source_video, output_filename)
+                logger.info(f"Successfully placed single video at: {output_filename}")
                 return True
             except Exception as e:
                 logger.error(f"Failed to copy single video {source_video} to {output_filename}: {e}")
@@ -89,14 +802,18 @@ def merge_videos_in_folder(input_folder: str, output_filename: str) -> bool:
     for v_file in video_files:
         logger.info(f"- {os.path.basename(v_file)}")
 
+    probe_videos(video_files)
+
     timestamp_filename = os.path.join(os.path.dirname(output_filename),
                                       f"{os.path.splitext(os.path.basename(output_filename))[0]}_timestamps.txt")
     logger.info(f"Creating merged video timestamp file: {timestamp_filename}")
+    durations = {}
     try:
         with open(timestamp_filename, 'w') as f:
             total_duration = 0
             for i, video_path in enumerate(video_files):
                 duration = get_video_duration(video_path)
+                durations[video_path] = duration
                 if duration is not None:
                     f.write(
                         f"File {i + 1}: {os.path.basename(video_path)}, Start: {total_duration:.2f}s, Duration: {duration:.2f}s\n")
@@ -110,30 +827,65 @@ def merge_videos_in_folder(input_folder: str, output_filename: str) -> bool:
     except Exception as e:
         logger.warning(f"Failed to create timestamp file: {e}")
 
-    concat_list_path = os.path.join(input_folder, "ffmpeg_concat_list.txt")
-    try:
-        with open(concat_list_path, "w") as f:
-            for video_path in video_files:
-                f.write(f"file '{video_path.replace(os.sep, '/')}'\n")
-        logger.info(f"Created FFmpeg concat list file: {concat_list_path}")
-    except Exception as e:
-        logger.error(f"Failed to create FFmpeg concat list file: {e}")
-        return False
+    stream_infos = [get_video_stream_info(video_path) for video_path in video_files]
+    all_probed = all(info[0] is not None for info in stream_infos)
+    signatures = {_stream_signature(*info) for info in stream_infos if info[0] is not None}
+    can_stream_copy = all_probed and len(signatures) == 1
+    # Same video everywhere but different (or missing) audio: only the cheap audio stream needs re-encoding. Inputs
+    # without audio need a known duration for their silent track.
+    only_audio_differs = (not can_stream_copy and all_probed and len({video for video, _ in signatures}) == 1
+                          and all(info[1] is not None or durations.get(video_path)
+                                  for video_path, info in zip(video_files, stream_infos)))
+
+    concat_list = None
+    work_dir = None
+    concat_inputs = None
+    work_dir_parent = os.path.dirname(os.path.abspath(output_filename))
+    if can_stream_copy:
+        logger.info("All input videos share codec parameters. Merging with stream copy (no re-encode).")
+        concat_inputs = video_files
+    elif only_audio_differs:
+        logger.info("Input videos differ only in their audio. Re-encoding audio and stream-copying video.")
+        work_dir = tempfile.mkdtemp(prefix='audio_normalize_', dir=work_dir_parent)
+        concat_inputs = _reencode_audio_tracks(video_files, work_dir, os.cpu_count() or 1, ffmpeg_threads)
+        if concat_inputs is None:
+            logger.warning("Audio-only re-encode failed. Falling back to a full re-encode.")
 
-    ffmpeg_command = [arg.format(concat_list_path=concat_list_path, output_path=output_filename) for arg in
-                      FFMPEG_MERGE_COMMAND_TEMPLATE]
+    if concat_inputs is not None:
+        if any(map(_has_line_break, concat_inputs)):
+            work_dir = work_dir or tempfile.mkdtemp(prefix='concat_inputs_', dir=work_dir_parent)
+            concat_inputs = _concat_safe_inputs(concat_inputs, work_dir)
+        if parallel_merge and len(concat_inputs) > 2:
+            work_dir = work_dir or tempfile.mkdtemp(prefix='pairwise_merge_', dir=work_dir_parent)
+            reduced_inputs = _reduce_pairwise(concat_inputs, work_dir, os.cpu_count() or 1)
+            if reduced_inputs is None:
+                logger.warning("Pairwise merge failed. Falling back to a single concat of all inputs.")
+            else:
+                concat_inputs = reduced_inputs
+        concat_list = "".join(_concat_list_entry(video_path) for video_path in concat_inputs)
+        ffmpeg_command = [arg.format(output_path=output_filename) for arg in FFMPEG_MERGE_COMMAND_TEMPLATE]
+    else:
+        logger.warning("Input videos have mismatched codec parameters. Re-encoding to a common profile.")
+        ffmpeg_command = _build_reencode_command(video_files, stream_infos, durations, output_filename,
+                                                 ffmpeg_threads=ffmpeg_threads, preset=preset)
 
     logger.info(f"Merging and saving final video to: {output_filename}")
     logger.info(f"Executing FFmpeg command: {' '.join(ffmpeg_command)}")
 
     merge_success = False
     try:
-        result = subprocess.run(ffmpeg_command, capture_output=True, text=True, check=False)
-        if result.returncode != 0:
+        _replace_output(output_filename)
+        returncode, stderr_tail = _run_ffmpeg(ffmpeg_command, concat_list)
+        if returncode != 0 and concat_list is None and 'hwaccel' in stderr_tail.lower():
+            logger.warning("Hardware-accelerated decoding failed. Retrying the re-encode with software decoding.")
+            ffmpeg_command = _build_reencode_command(video_files, stream_infos, durations, output_filename,
+                                                     ffmpeg_threads=ffmpeg_threads, preset=preset, hwaccel=False)
+            _replace_output(output_filename)
+            returncode, stderr_tail = _run_ffmpeg(ffmpeg_command)
+        if returncode != 0:
             logger.error(
-                f"An error occurred during final video merging with FFmpeg: Command returned non-zero exit status {result.returncode}.")
-            logger.error(f"FFmpeg stdout:\n{result.stdout}")
-            logger.error(f"FFmpeg stderr:\n{result.stderr}")
+                f"An error occurred during final video merging with FFmpeg: Command returned non-zero exit status {returncode}.")
+            logger.error(f"FFmpeg stderr (last {FFMPEG_STDERR_TAIL_LINES} lines):\n{stderr_tail}")
         else:
             logger.info(f"Successfully merged video to: {output_filename}")
             merge_success = True
@@ -142,8 +894,7 @@ def merge_videos_in_folder(input_folder: str, output_filename: str) -> bool:
     except Exception as e:
         logger.error(f"An unexpected error occurred during final FFmpeg execution: {e}", exc_info=True)
     finally:
-        if os.path.exists(concat_list_path):
-            os.remove(concat_list_path)
-            logger.info(f"Cleaned up temporary concat list file: {concat_list_path}")
+        if work_dir:
+            _discard_work_dir(work_dir)
 
     return merge_success
\ No newline at end of file
@@ -1,12 +1,11 @@
-import shutil
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from django.core.management.base import BaseCommand
 import logging
 import os
 
-from googleapiclient.errors import HttpError
-
 from ...helpers import download_videos_from_google_drive_helper as gdh, video_merger_helper as vmh
+from ...helpers import logging_helper, media_cache_helper
 
 logger = logging.getLogger(__name__)
 
@@ -23,18 +22,38 @@ class Command(BaseCommand):
             required=True,
             help='ID pof shared Google Drive folder containing property videos'
         )
+        parser.add_argument(
+            '--full_scan',
+            action='store_true',
+            help='Ignore the saved change token and rescan the whole folder tree.'
+        )
 
     def handle(self, *args, **options):
+        logging_helper.start_queue_logging()
         SHARED_FOLDER_ID = options['folder_id']
-        folder_path = r"C:\Users\Ankit.Anand\PycharmProjects\nso\downloaded_videos"
+        input_folder = r"C:\Users\Ankit.Anand\PycharmProjects\nso\downloaded_videos"
+        output_name = r"final_consolidated_property_video.mp4"
 
-        shutil.rmtree(folder_path)
         service = gdh.get_drive_service()
         os.makedirs(gdh.DOWNLOAD_DIR, exist_ok=True)
         gdh.is_file_in_folder_hierarchy.cache_clear()
+        folders_to_process_data = {}
+        sync_failed = False
+        new_token_for_next_run = None
         try:
             initial_start_page_response = service.changes().getStartPageToken(supportsAllDrives=True).execute()
             new_token_for_next_run = initial_start_page_response.get('startPageToken')
+
+            previous_token = None if options['full_scan'] else gdh.get_last_change_token(SHARED_FOLDER_ID)
+            if previous_token and os.path.exists(output_name):
+                self.stdout.write(f"Checking Drive change log since token {previous_token}...")
+                if not gdh.folder_has_changes(service, previous_token, SHARED_FOLDER_ID):
+                    self.stdout.write(self.style.SUCCESS(
+                        f"No changes under folder {SHARED_FOLDER_ID} since the last run. Nothing to do."))
+                    self._save_change_token(new_token_for_next_run, SHARED_FOLDER_ID)
+                    return
+                self.stdout.write("Changes detected since the last run.")
+
             self.stdout.write(
                 self.style.SUCCESS(f"Initiating full recursive scan and download for folder: {SHARED_FOLDER_ID}"))
 
@@ -42,77 +61,122 @@ class Command(BaseCommand):
             if not video_mime_types:
                 self.stdout.write(
                     self.style.WARNING("No video MIME types configured in helper. Skipping full video scan."))
-                gdh.save_last_change_token(new_token_for_next_run)
                 return
-            folders_to_scan = [SHARED_FOLDER_ID]
-            scanned_folders = set()
+            # Subfolder names arrive with the parent's listing; only the root needs a lookup.
+            folder_names = gdh.get_drive_folder_names(service, [SHARED_FOLDER_ID])
             downloaded_count_initial = 0
-            while folders_to_scan:
-                current_folder_id = folders_to_scan.pop(0)
-                if current_folder_id in scanned_folders:
-                    self.stdout.write(f"  Skipping already scanned folder ID: {current_folder_id}")
-                    continue
-                scanned_folders.add(current_folder_id)
-                self.stdout.write(f"Scanning contents of folder ID: {current_folder_id}")
-                temp_page_token = None
-                while True:
-                    try:
-                        q_filter = f"'{current_folder_id}' in parents and (mimeType='application/vnd.google-apps.folder' or ({' or '.join([f'mimeType="{m}"' for m in video_mime_types])})) and trashed=false"
-                        folder_contents_response = service.files().list(
-                            q=q_filter,
-                            spaces='drive',
-                            fields='nextPageToken, files(id, name, mimeType, parents)',
-                            pageToken=temp_page_token,
-                            supportsAllDrives=True,
-                            includeItemsFromAllDrives=True,
-                        ).execute()
-                        found_items_on_page = folder_contents_response.get('files', [])
-                        if not found_items_on_page:
-                            self.stdout.write(
-                                f"  No new items found in folder ID: {current_folder_id} on this page.")
-                        for item in found_items_on_page:
-                            item_id = item.get('id')
-                            item_name = item.get('name')
-                            item_mime_type = item.get('mimeType')
-
-                            if item_mime_type == 'application/vnd.google-apps.folder':
-                                folders_to_scan.append(item_id)
-                                self.stdout.write(
-                                    f"  Found subfolder: '{item_name}' (ID: {item_id}). Adding to scan queue.")
-                            elif item_mime_type in video_mime_types:
-                                self.stdout.write(
-                                    f"  Found existing video: '{item_name}' (ID: {item_id}, Type: {item_mime_type}). Downloading...")
-                                gdh.download_file(service, item_id, item_name, gdh.DOWNLOAD_DIR, item_mime_type)
-                                downloaded_count_initial += 1
-                        temp_page_token = folder_contents_response.get('nextPageToken', None)
-                        if temp_page_token is None:
-                            break
-                    except HttpError as error:
+            # Folders are independent, so each one is handed to the download pool as soon as its listing is
+            # complete; downloading then overlaps with scanning the rest of the tree. The work is network and disk
+            # I/O, so threads are enough: no worker interpreters to spawn and no pickling of folder listings.
+            max_workers = max(1, (os.cpu_count() or 2) // 2)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {}
+
+                def on_folder_listed(current_folder_id, found_items, error):
+                    nonlocal sync_failed
+                    if error is not None:
+                        sync_failed = True
                         self.stdout.write(self.style.ERROR(
-                            f"An API error occurred during initial scan of folder {current_folder_id}: {error}"))
-                        break
+                            f"An error occurred during initial scan of folder {current_folder_id}: {error}"))
+                        return
+                    self.stdout.write(f"Scanned contents of folder ID: {current_folder_id}")
+                    if not found_items:
+                        self.stdout.write(f"  No items found in folder ID: {current_folder_id}.")
+                    for item in found_items:
+                        item_id = item.get('id')
+                        item_name = item.get('name')
+                        item_mime_type = item.get('mimeType')
+
+                        if item_mime_type == gdh.FOLDER_MIME_TYPE:
+                            folder_names[item_id] = item_name
+                            self.stdout.write(
+                                f"  Found subfolder: '{item_name}' (ID: {item_id}). Adding to scan queue.")
+                        elif item_mime_type in video_mime_types:
+                            # Subfolders are flattened into one download folder, so same-named videos are normal.
+                            # Claiming here, on the scan thread, keeps the first one found instead of whichever
+                            # download thread gets there first.
+                            local_name = gdh.get_local_file_name(item_name, item_mime_type)
+                            if not gdh.claim_local_path(item_id, os.path.join(gdh.DOWNLOAD_DIR, local_name)):
+                                self.stdout.write(self.style.WARNING(
+                                    f"  Skipping video '{item_name}' (ID: {item_id}): another video in the folder "
+                                    f"tree is already saved as {local_name}."))
+                                continue
+                            self.stdout.write(
+                                f"  Found existing video: '{item_name}' (ID: {item_id}, Type: {item_mime_type}). Queued for download.")
+                            folders_to_process_data.setdefault(current_folder_id, {})[item_id] = item
+
+                    files_in_folder = folders_to_process_data.get(current_folder_id)
+                    if files_in_folder:
+                        future = executor.submit(gdh.download_folder_files, current_folder_id, files_in_folder,
+                                                 gdh.DOWNLOAD_DIR)
+                        futures[future] = current_folder_id
+
+                gdh.scan_folder_tree(SHARED_FOLDER_ID, video_mime_types, on_folder_listed)
+
+                for future in as_completed(futures):
+                    folder_id = futures[future]
+                    folder_label = f"'{folder_names.get(folder_id) or folder_id}' (ID: {folder_id})"
+                    try:
+                        _, file_count, failed_count = future.result()
+                        downloaded_count_initial += file_count
+                        self.stdout.write(f"  Finished downloading {file_count} videos from folder {folder_label}")
+                        if failed_count:
+                            sync_failed = True
+                            self.stdout.write(self.style.ERROR(
+                                f"  {failed_count} videos could not be downloaded from folder {folder_label}"))
                     except Exception as e:
+                        sync_failed = True
                         self.stdout.write(self.style.ERROR(
-                            f"An unexpected error occurred during initial scan of folder {current_folder_id}: {e}"))
-                        break
+                            f"An unexpected error occurred while downloading folder {folder_label}: {e}"))
             self.stdout.write(self.style.SUCCESS(
                 f"Full recursive scan complete. Downloaded {downloaded_count_initial} existing videos."))
-            gdh.save_last_change_token(new_token_for_next_run)
-            self.stdout.write(self.style.SUCCESS(
-                f"Updated last change token to: {new_token_for_next_run} (for potential future incremental runs)."))
         except gdh.HttpError as error:
+            sync_failed = True
             self.stdout.write(self.style.ERROR(f"An API error occurred during full scan setup: {error}"))
         except Exception as e:
+            sync_failed = True
             self.stdout.write(self.style.ERROR(f"An unexpected error occurred during full scan setup: {e}"))
 
-        input_folder = r"C:\Users\Ankit.Anand\PycharmProjects\nso\downloaded_videos"
-        output_name = r"final_consolidated_property_video.mp4"
+        merge_key = None
+        if not sync_failed:
+            # Downloads are kept between runs (see media_cache_helper); drop anything no longer in the Drive folder.
+            expected_files = {
+                gdh.get_local_file_name(item['name'], item['mimeType'])
+                for files_in_folder in folders_to_process_data.values() for item in files_in_folder.values()
+            }
+            for existing_path in get_filenames_in_folder(input_folder):
+                if os.path.basename(existing_path) not in expected_files:
+                    os.remove(existing_path)
+                    self.stdout.write(f"Removed stale local file: {existing_path}")
+            gdh.prune_blob_cache()
+
+            merge_key = media_cache_helper.merge_inputs_key(
+                (gdh.get_local_file_name(item['name'], item['mimeType']), item.get('md5Checksum') or item['id'])
+                for files_in_folder in folders_to_process_data.values() for item in files_in_folder.values()
+            )
+            if media_cache_helper.is_merge_cached(merge_key, output_name):
+                self.stdout.write(self.style.SUCCESS(
+                    f"No videos changed since the last run. Reusing existing merged video: {output_name}"))
+                self._save_change_token(new_token_for_next_run, SHARED_FOLDER_ID)
+                return
 
         self.stdout.write(f"Starting video merge process for folder: {input_folder}")
         self.stdout.write(f"Output video will be named: {output_name}")
 
         if vmh.merge_videos_in_folder(input_folder, output_name):
+            if merge_key:
+                media_cache_helper.store_merge(merge_key, output_name)
             self.stdout.write(self.style.SUCCESS("\nVideo merging completed successfully!"))
+            if not sync_failed:
+                self._save_change_token(new_token_for_next_run, SHARED_FOLDER_ID)
+
+    def _save_change_token(self, token, folder_id):
+        # Only persisted once the merged video is up to date, so a failed run is retried in full next time.
+        if not token:
+            return
+        gdh.save_last_change_token(token, folder_id)
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated last change token to: {token} (for incremental runs)."))
 
 
 def get_filenames_in_folder(folder_path):
@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand, CommandError
-from ...helpers.convert_ppt_to_video_helper import convert_pptx_to_video, ConversionError # <-- IMPORTANT: Replace 'my_django_app' with your actual Django app name!
+from ...helpers.convert_ppt_to_video_helper import convert_pptx_to_video, ConversionError, RENDER_WORKERS # <-- IMPORTANT: Replace 'my_django_app' with your actual Django app name!
 
 class Command(BaseCommand):
     help = 'Exports a PowerPoint presentation (.pptx) to a video file (.mp4) using portable LibreOffice, PyMuPDF, and FFmpeg.'
@@ -35,6 +35,12 @@ class Command(BaseCommand):
             default=30,
             help='Frame rate of the output video (frames per second).'
         )
+        parser.add_argument(
+            '--render_workers',
+            type=int,
+            default=RENDER_WORKERS,
+            help='Number of worker processes used to render slides to images.'
+        )
 
     def handle(self, *args, **options):
         ppt_path = options['ppt_path']
@@ -42,6 +48,7 @@ class Command(BaseCommand):
         slide_duration_seconds = options['slide_duration_seconds']
         resolution = options['resolution']
         frame_rate = options['frame_rate']
+        render_workers = options['render_workers']
 
         try:
             convert_pptx_to_video(
@@ -50,6 +57,7 @@ class Command(BaseCommand):
                 slide_duration_seconds=slide_duration_seconds,
                 resolution=resolution,
                 frame_rate=frame_rate,
+                render_workers=render_workers,
                 stdout=self.stdout,
                 style=self.style
             )
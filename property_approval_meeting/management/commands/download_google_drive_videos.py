@@ -58,6 +58,7 @@ class Command(BaseCommand):
                         folder_contents_response = service.files().list(
                             q=q_filter,
                             spaces='drive',
+                            pageSize=1000,
                             fields='nextPageToken, files(id, name, mimeType, parents)',
                             pageToken=temp_page_token,
                             supportsAllDrives=True,
@@ -1,8 +1,11 @@
 import os
+import sys
+import threading
+from concurrent.futures import as_completed, wait
 from django.core.management.base import BaseCommand, CommandError
 from urllib.parse import urlparse  # Import urlparse for parsing URLs
 from ...helpers import video_downloader_helper
-from ...helpers.video_downloader_helper import get_gdrive_authenticated_service,download_youtube_vimeo_etc,download_google_drive_video,download_generic_video # This imports the module by its name
+from ...helpers.video_downloader_helper import get_gdrive_authenticated_service,download_youtube_vimeo_etc_batch,download_generic_videos,DownloaderWorker,route_url,YTDLP,GDRIVE,GENERIC,PER_HOST_CONCURRENCY # This imports the module by its name
 
 
 class Command(BaseCommand):
@@ -12,18 +15,90 @@ class Command(BaseCommand):
         parser.add_argument(
             '--url_list_file',
             type=str,
-            required=True,
             help="Path to the text file containing one URL per line."
         )
+        parser.add_argument(
+            '--serve_stdin',
+            action='store_true',
+            help="Keep running and download each URL read from stdin (one per line) as it arrives, until EOF."
+        )
         parser.add_argument(
             '--output_dir',
             type=str,
             default='downloads',
             help="Directory to save downloaded videos. Will be created if it doesn't exist."
         )
+        parser.add_argument(
+            '--max_workers',
+            type=int,
+            default=4,
+            help="Number of URLs to download concurrently."
+        )
+        parser.add_argument(
+            '--http_chunk_size',
+            type=int,
+            default=video_downloader_helper.HTTP_DOWNLOAD_CHUNK_SIZE,
+            help="Bytes read per iteration for direct video links. Lower it on memory-constrained machines."
+        )
+        parser.add_argument(
+            '--connections',
+            type=int,
+            default=1,
+            help="Parallel range requests per direct video link, used when the server supports byte ranges."
+        )
+        parser.add_argument(
+            '--stream_merge',
+            action='store_true',
+            help="Stream YouTube/Vimeo/Dailymotion URLs straight into one merged video instead of saving each file. "
+                 "Needs named pipes (Linux/macOS) and inputs that share codecs."
+        )
+        parser.add_argument(
+            '--merged_output',
+            type=str,
+            default='merged_video.mp4',
+            help="File name, inside the output directory, of the --stream_merge result."
+        )
+
+    def _write_summary(self, total, successful_downloads):
+        self.stdout.write(self.style.SUCCESS(f"\n--- Download Summary ---"))
+        self.stdout.write(self.style.SUCCESS(f"Total URLs processed: {total}"))
+        self.stdout.write(self.style.SUCCESS(f"Successful downloads: {successful_downloads}"))
+        self.stdout.write(self.style.WARNING(f"Failed downloads: {total - successful_downloads}"))
+        self.stdout.write(self.style.SUCCESS("------------------------"))
+
+    def _serve_stdin(self, worker):
+        self.stdout.write("\nReading URLs from stdin, one per line, until EOF...")
+        futures = []
+        successful = []
+        lock = threading.Lock()
+
+        def report(url, future):
+            try:
+                downloaded = future.result()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Unexpected error downloading {url}: {e}"))
+                downloaded = False
+            with lock:
+                successful.append(downloaded)
+            if downloaded:
+                self.stdout.write(self.style.SUCCESS(f"  Done: {url}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"  Failed: {url}"))
+
+        for line in sys.stdin:
+            url = line.strip()
+            if not url:
+                continue
+            future = worker.submit(url)
+            future.add_done_callback(lambda f, url=url: report(url, f))
+            futures.append(future)
+        wait(futures)
+        self._write_summary(len(futures), sum(successful))
 
     def handle(self, *args, **options):
         url_list_file = options['url_list_file']
+        if not url_list_file and not options['serve_stdin']:
+            raise CommandError("Provide --url_list_file, or --serve_stdin to read URLs from stdin.")
         output_dir = options['output_dir']
         abs_output_dir = os.path.abspath(output_dir)
         os.makedirs(abs_output_dir, exist_ok=True)
@@ -40,6 +115,18 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.WARNING(
                 "No 'credentials.json' found for Google Drive API. Google Drive links will not be downloaded."))
+
+        worker = DownloaderWorker(abs_output_dir, max_workers=options['max_workers'],
+                                  http_chunk_size=options['http_chunk_size'], connections=options['connections'],
+                                  gdrive_available=gdrive_service is not None)
+        with worker:
+            if options['serve_stdin']:
+                self._serve_stdin(worker)
+            else:
+                self._download_url_list(worker, url_list_file, options)
+
+    def _download_url_list(self, worker, url_list_file, options):
+        abs_output_dir = worker.output_dir
         urls_to_download = []
         try:
             with open(url_list_file, 'r', encoding='utf-8') as f:
@@ -56,31 +143,63 @@ class Command(BaseCommand):
         self.stdout.write(f"\nFound {len(urls_to_download)} URLs to process.")
         successful_downloads = 0
 
-        for i, url in enumerate(urls_to_download):
-            self.stdout.write(f"\n--- Processing URL {i + 1}/{len(urls_to_download)}: {url} ---")
-            downloaded = False
+        executor = worker.executor
+        routes = []
+        for url in urls_to_download:
             parsed_url = urlparse(url)
-            if "youtube.com" in parsed_url.netloc or "youtu.be" in parsed_url.netloc or \
-                    "vimeo.com" in parsed_url.netloc or "dailymotion.com" in parsed_url.netloc:
-                downloaded = download_youtube_vimeo_etc(url, abs_output_dir)
-            elif "drive.google.com" in parsed_url.netloc:
-                if gdrive_service:
-                    downloaded = download_google_drive_video(gdrive_service, url, abs_output_dir)
-                else:
-                    self.stdout.write(
-                        self.style.WARNING("  Skipping Google Drive link: Google Drive API not authenticated."))
+            routes.append((url, parsed_url, route_url(parsed_url)))
+
+        # One yt-dlp process handles every platform URL so its startup cost is paid once, not per URL.
+        ytdlp_urls = []
+        for url, _, handler in routes:
+            if handler != YTDLP:
+                continue
+            # The merged file is rebuilt from every URL, so stream merging cannot leave out ones already on disk.
+            if not options['stream_merge'] and worker.manifest.get_local(url):
+                self.stdout.write(f"  Skipping {url}: already downloaded.")
+                successful_downloads += 1
             else:
-                if any(ext in parsed_url.path.lower() for ext in ['.mp4', '.mov', '.webm', '.avi', '.mkv', '.flv']):
-                    downloaded = download_generic_video(url, abs_output_dir)
-                else:
-                    self.stdout.write(self.style.WARNING(
-                        f"  Warning: URL not recognized as a supported video platform or direct video link. Skipping: {url}"))
+                ytdlp_urls.append(url)
+        batch_futures = []
+        if ytdlp_urls and options['stream_merge']:
+            self.stdout.write(f"\n--- Stream-merging {len(ytdlp_urls)} URL(s) ---")
+            batch_futures.append(executor.submit(video_downloader_helper.stream_merge_videos, ytdlp_urls,
+                                                 os.path.join(abs_output_dir, options['merged_output'])))
+        elif ytdlp_urls:
+            self.stdout.write(f"\n--- Downloading {len(ytdlp_urls)} URL(s) in one yt-dlp batch ---")
+            batch_futures.append(executor.submit(download_youtube_vimeo_etc_batch, ytdlp_urls, abs_output_dir,
+                                                 worker.manifest))
+
+        # Single-connection direct links share one event loop instead of holding a pool thread each; striped
+        # (--connections > 1) downloads stay on the thread pool.
+        batched_handlers = {YTDLP, GENERIC} if worker.connections == 1 else {YTDLP}
+        generic_urls = [url for url, _, handler in routes if handler == GENERIC and GENERIC in batched_handlers]
+        if generic_urls:
+            self.stdout.write(f"\n--- Downloading {len(generic_urls)} direct link(s) concurrently ---")
+            batch_futures.append(executor.submit(
+                download_generic_videos, generic_urls, abs_output_dir, worker.http_chunk_size,
+                per_host=PER_HOST_CONCURRENCY, manifest=worker.manifest))
+
+        # One batched metadata request for all Drive links instead of a files.get round-trip per link.
+        worker.prefetch_gdrive_metadata([url for url, _, handler in routes if handler == GDRIVE])
+
+        futures = {}
+        for i, (url, parsed_url, handler) in enumerate(routes):
+            if handler in batched_handlers:
+                continue
+            self.stdout.write(f"\n--- Processing URL {i + 1}/{len(urls_to_download)}: {url} ---")
+            futures[worker.submit(url, parsed_url, handler)] = url
 
+        for future in as_completed(futures):
+            try:
+                downloaded = future.result()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"  Unexpected error downloading {futures[future]}: {e}"))
+                downloaded = False
             if downloaded:
                 successful_downloads += 1
 
-        self.stdout.write(self.style.SUCCESS(f"\n--- Download Summary ---"))
-        self.stdout.write(self.style.SUCCESS(f"Total URLs processed: {len(urls_to_download)}"))
-        self.stdout.write(self.style.SUCCESS(f"Successful downloads: {successful_downloads}"))
-        self.stdout.write(self.style.WARNING(f"Failed downloads: {len(urls_to_download) - successful_downloads}"))
-        self.stdout.write(self.style.SUCCESS("------------------------"))
+        for future in batch_futures:
+            successful_downloads += sum(future.result().values())
+
+        self._write_summary(len(urls_to_download), successful_downloads)
@@ -1,5 +1,6 @@
 import os
 from django.core.management.base import BaseCommand, CommandError
+from property_approval_meeting.helpers import logging_helper
 from property_approval_meeting.helpers.google_slides_helper import create_slides_from_folder
 
 class Command(BaseCommand):
@@ -13,6 +14,8 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        # google_slides_helper reports progress (including the browser auth prompt) through logging.
+        logging_helper.start_queue_logging()
         folder_id = options['folder_id']
         client_secret_path = r'C:\Users\Ankit.Anand\PycharmProjects\nso\property_approval_meeting\helpers\credentials.json'
         token_path = os.path.join(os.path.dirname(client_secret_path), 'token.json')
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand, CommandError
-from ...helpers.video_merger_helper import merge_videos_in_folder
+from ...helpers import logging_helper
+from ...helpers.video_merger_helper import merge_videos_in_folder, FFMPEG_PRESET
 
 class Command(BaseCommand):
     help = 'Merges all video files in a specified local folder into a single video file.'
@@ -18,15 +19,29 @@ class Command(BaseCommand):
             help="Name of the output merged video file (e.g., 'my_final_video.mp4'). "
                  "If a full path is not provided, it will be saved in the current working directory."
         )
+        parser.add_argument(
+            '--preset',
+            type=str,
+            default=FFMPEG_PRESET,
+            help="libx264 preset used when the inputs have to be re-encoded (e.g. 'veryfast', or 'medium' "
+                 "for smaller files at the cost of speed)."
+        )
+        parser.add_argument(
+            '--parallel_merge',
+            action='store_true',
+            help="When inputs can be stream-copied, merge them pairwise in parallel rounds before the final concat."
+        )
 
     def handle(self, *args, **options):
+        logging_helper.start_queue_logging()
         input_folder = options['input_folder']
         output_name = options['output_name']
 
         self.stdout.write(f"Starting video merge process for folder: {input_folder}")
         self.stdout.write(f"Output video will be named: {output_name}")
 
-        if merge_videos_in_folder(input_folder, output_name):
+        if merge_videos_in_folder(input_folder, output_name, preset=options['preset'],
+                                  parallel_merge=options['parallel_merge']):
             self.stdout.write(self.style.SUCCESS("\nVideo merging completed successfully!"))
         else:
             raise CommandError("\nVideo merging failed. Please check the error messages above.")
@@ -10,7 +10,8 @@ from ...helpers.pipeline_helper import (
     IntegratedPipelineHelper,
     FILES_TO_PROCESS_MIME_TYPES,
     get_file_extension,
-    TEMP_DOWNLOAD_DIRECTORY
+    TEMP_DOWNLOAD_DIRECTORY,
+    clear_presentation_cache
 )
 
 logger = logging.getLogger(__name__)
@@ -69,6 +70,7 @@ class Command(BaseCommand):
         cleanup_temp_dir = options['cleanup_temp_dir']
 
         helper = IntegratedPipelineHelper(output_stream=self.stdout.write, style=self.style)
+        clear_presentation_cache()
 
         self.stdout.write(self.style.SUCCESS(
             f"Starting integrated processing for PPTX ID '{ppt_file_id}' "
@@ -105,13 +107,18 @@ class Command(BaseCommand):
 
             local_pptx_path = os.path.join(temp_download_dir, pptx_file_name)
             self.stdout.write(f"Downloading PPTX '{pptx_file_name}' (ID: {ppt_file_id}) from Drive...")
-            if not helper.download_file_from_drive(drive_service, ppt_file_id, local_pptx_path):
+            if not helper.download_file_from_drive(drive_service, ppt_file_id, local_pptx_path,
+                                                   mime_type=pptx_metadata.get('mimeType')):
                 raise CommandError(self.style.ERROR(f"Failed to download PPTX file: {pptx_file_name}"))
             self.stdout.write(self.style.SUCCESS(f"PPTX downloaded to: {local_pptx_path}"))
 
             # --- PART 2: Create Drive Folder Structure & Move PPTX ---
             self.stdout.write(self.style.SUCCESS("\n--- PART 2: Creating Drive Folder Structure and Moving PPTX ---"))
-            market_name, zone_name = helper.get_market_and_zone_name_from_ppt(local_pptx_path)
+            # Opened once and shared by the market/zone, prefix and link extractors below.
+            pptx_ctx = helper.open_pptx_context(local_pptx_path)
+            if pptx_ctx is None:
+                raise CommandError(f"Downloaded PPTX is not a readable .pptx file: {local_pptx_path}")
+            market_name, zone_name = helper.get_market_and_zone_name_from_ppt(local_pptx_path, ctx=pptx_ctx)
 
             if not market_name:
                 raise CommandError("Could not extract Market Name from the PPTX. Cannot create folder structure.")
@@ -144,7 +151,7 @@ class Command(BaseCommand):
             # --- PART 3: Process Videos (Download, Re-upload to new Drive folder, YouTube Upload) ---
             self.stdout.write(self.style.SUCCESS("\n--- PART 3: Processing Videos ---"))
 
-            market_name_prefix_raw = helper.get_market_name_prefix_for_videos(local_pptx_path)
+            market_name_prefix_raw = helper.get_market_name_prefix_for_videos(local_pptx_path, ctx=pptx_ctx)
             prefix_for_filename = ""
             if market_name_prefix_raw:
                 prefix_for_filename = f"{re.sub(r'[\\/:*?"<>|]', '', market_name_prefix_raw).strip()} "
@@ -153,7 +160,7 @@ class Command(BaseCommand):
                 self.stdout.write("No valid market name prefix found or extracted for videos.")
 
             self.stdout.write("Extracting potential video links and associated names from PPTX...")
-            extracted_links_with_names = helper.extract_all_potential_links_from_last_slide(local_pptx_path)
+            extracted_links_with_names = helper.extract_all_potential_links_from_last_slide(local_pptx_path, ctx=pptx_ctx)
             self.stdout.write(f"Found {len(extracted_links_with_names)} potential links.")
             google_drive_file_id_pattern = re.compile(r'drive\.google\.com/(?:file/d/|uc\?id=)([a-zA-Z0-9_-]+)')
 
@@ -166,6 +173,9 @@ class Command(BaseCommand):
             if not youtube_service:
                 self.stdout.write(self.style.WARNING("Failed to authenticate with YouTube API. Skipping YouTube uploads."))
 
+            # Resolve every Drive link to a local path first so all videos can be downloaded in one parallel batch.
+            videos_to_process = []
+            reserved_local_paths = set()
             for item in extracted_links_with_names:
                 link = item['link']
                 suggested_name = item['name']
@@ -176,7 +186,7 @@ class Command(BaseCommand):
                     self.stdout.write(f"\n--- Detected Google Drive video link: {link} (ID: {video_drive_id}) ---")
 
                     try:
-                        file_metadata = drive_service.files().get(fileId=video_drive_id, fields='name,mimeType').execute()
+                        file_metadata = drive_service.files().get(fileId=video_drive_id, fields='name,mimeType,size').execute()
                         original_video_name_from_drive = file_metadata.get('name', f"unknown_video_{video_drive_id}")
                         video_mime_type = file_metadata.get('mimeType', 'application/octet-stream')
 
@@ -191,59 +201,22 @@ class Command(BaseCommand):
                         final_video_name = f"{prefix_for_filename}{base_name_for_file}{ext_from_drive if ext_from_drive else get_file_extension(video_mime_type)}"
                         local_video_path = os.path.join(temp_download_dir, final_video_name)
 
-                        # Handle potential filename collisions by appending a counter
+                        # Handle potential filename collisions (on disk or within this batch) by appending a counter
                         counter = 1
                         original_local_video_path_base, original_local_video_path_ext = os.path.splitext(local_video_path)
-                        while os.path.exists(local_video_path):
+                        while os.path.exists(local_video_path) or local_video_path in reserved_local_paths:
                             local_video_path = f"{original_local_video_path_base}_{counter}{original_local_video_path_ext}"
                             counter += 1
-
-                        self.stdout.write(f"Downloading Google Drive video '{final_video_name}' to {local_video_path}...")
-                        if helper.download_file_from_drive(drive_service, video_drive_id, local_video_path):
-                            downloaded_video_count += 1
-                            self.stdout.write(self.style.SUCCESS(f"Successfully downloaded: {local_video_path}"))
-
-                            if os.path.exists(local_video_path) and os.path.getsize(local_video_path) < 1024: # Check for very small files
-                                self.stdout.write(self.style.WARNING(
-                                    f"WARNING: Downloaded video '{local_video_path}' is very small ({os.path.getsize(local_video_path)} bytes). "
-                                    "This might indicate an error or permission issue. Skipping re-upload to Drive and YouTube."
-                                ))
-                                continue
-
-                            # Re-upload to the NEWLY CREATED/FOUND market folder
-                            self.stdout.write(
-                                f"Uploading '{final_video_name}' back to NEW Google Drive folder '{market_folder_id}'...")
-                            uploaded_file_id = helper.upload_file_to_drive(drive_service, final_video_name,
-                                                                                 local_video_path,
-                                                                                 video_mime_type,
-                                                                                 market_folder_id) # Use market_folder_id
-                            if uploaded_file_id:
-                                re_uploaded_to_drive_count += 1
-                                self.stdout.write(self.style.SUCCESS(
-                                    f"Successfully re-uploaded: {final_video_name} (New Drive ID: {uploaded_file_id})"))
-                            else:
-                                self.stdout.write(
-                                    self.style.ERROR(f"Failed to re-upload '{final_video_name}' to Google Drive."))
-
-                            # Upload to YouTube
-                            if youtube_service:
-                                self.stdout.write(f"Uploading '{final_video_name}' to YouTube...")
-                                video_title = market_name+" "+ os.path.splitext(final_video_name)[0]
-                                youtube_video_id = helper.upload_video_to_youtube(
-                                    youtube_service,
-                                    local_video_path,
-                                    title=video_title,
-                                )
-                                if youtube_video_id:
-                                    self._log_uploaded_video_link(final_video_name, youtube_video_id)
-                                    uploaded_to_youtube_count += 1
-                                else:
-                                    self.stdout.write(self.style.ERROR(f"Failed to upload '{final_video_name}' to YouTube."))
-                            else:
-                                self.stdout.write(self.style.WARNING("YouTube service not available. Skipping YouTube upload."))
-                        else:
-                            self.stdout.write(self.style.ERROR(f"Failed to download Google Drive video: {link}"))
-
+                        reserved_local_paths.add(local_video_path)
+
+                        videos_to_process.append({
+                            'link': link,
+                            'drive_id': video_drive_id,
+                            'name': final_video_name,
+                            'mime_type': video_mime_type,
+                            'size': file_metadata.get('size'),
+                            'local_path': local_video_path,
+                        })
                     except Exception as e:
                         self.stdout.write(
                             self.style.ERROR(f"An error occurred while processing Google Drive video link {link}: {e}"))
@@ -255,6 +228,73 @@ class Command(BaseCommand):
                     self.stdout.write(
                         f"Skipping non-Google Drive link: {link} (This script only processes Google Drive videos).")
 
+            self.stdout.write(f"Downloading {len(videos_to_process)} Google Drive videos...")
+            download_results = helper.download_files_from_drive(
+                drive_service,
+                [(video['drive_id'], video['local_path']) for video in videos_to_process],
+                file_sizes={video['drive_id']: video['size'] for video in videos_to_process},
+                mime_types={video['drive_id']: video['mime_type'] for video in videos_to_process},
+            )
+
+            for video in videos_to_process:
+                link = video['link']
+                final_video_name = video['name']
+                video_mime_type = video['mime_type']
+                local_video_path = video['local_path']
+                try:
+                    if download_results.get(video['drive_id']):
+                        downloaded_video_count += 1
+                        self.stdout.write(self.style.SUCCESS(f"Successfully downloaded: {local_video_path}"))
+
+                        if os.path.exists(local_video_path) and os.path.getsize(local_video_path) < 1024: # Check for very small files
+                            self.stdout.write(self.style.WARNING(
+                                f"WARNING: Downloaded video '{local_video_path}' is very small ({os.path.getsize(local_video_path)} bytes). "
+                                "This might indicate an error or permission issue. Skipping re-upload to Drive and YouTube."
+                            ))
+                            continue
+
+                        # Re-upload to the NEWLY CREATED/FOUND market folder
+                        self.stdout.write(
+                            f"Uploading '{final_video_name}' back to NEW Google Drive folder '{market_folder_id}'...")
+                        uploaded_file_id = helper.upload_file_to_drive(drive_service, final_video_name,
+                                                                             local_video_path,
+                                                                             video_mime_type,
+                                                                             market_folder_id) # Use market_folder_id
+                        if uploaded_file_id:
+                            re_uploaded_to_drive_count += 1
+                            self.stdout.write(self.style.SUCCESS(
+                                f"Successfully re-uploaded: {final_video_name} (New Drive ID: {uploaded_file_id})"))
+                        else:
+                            self.stdout.write(
+                                self.style.ERROR(f"Failed to re-upload '{final_video_name}' to Google Drive."))
+
+                        # Upload to YouTube
+                        if youtube_service:
+                            self.stdout.write(f"Uploading '{final_video_name}' to YouTube...")
+                            video_title = market_name+" "+ os.path.splitext(final_video_name)[0]
+                            youtube_video_id = helper.upload_video_to_youtube(
+                                youtube_service,
+                                local_video_path,
+                                title=video_title,
+                            )
+                            if youtube_video_id:
+                                self._log_uploaded_video_link(final_video_name, youtube_video_id)
+                                uploaded_to_youtube_count += 1
+                            else:
+                                self.stdout.write(self.style.ERROR(f"Failed to upload '{final_video_name}' to YouTube."))
+                        else:
+                            self.stdout.write(self.style.WARNING("YouTube service not available. Skipping YouTube upload."))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"Failed to download Google Drive video: {link}"))
+
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(f"An error occurred while processing Google Drive video link {link}: {e}"))
+                    if isinstance(e, HttpError):
+                        self.stdout.write(self.style.ERROR(
+                            "Check permissions for the video file or if the video file exists in Drive."))
+                    logger.exception(f"Error processing Google Drive video link: {link}")
+
             self.stdout.write(self.style.SUCCESS(f"\n--- PART 3 Summary (Video Processing) ---"))
             self.stdout.write(self.style.SUCCESS(f"Total videos downloaded from Drive: {downloaded_video_count}"))
             self.stdout.write(self.style.SUCCESS(f"Total videos re-uploaded to Drive (to new folder): {re_uploaded_to_drive_count}"))
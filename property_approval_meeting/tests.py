@@ -1,3 +1,190 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from fractions import Fraction
+from types import SimpleNamespace
+from urllib.parse import urlparse
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .helpers import pipeline_helper
+from .helpers import video_downloader_helper as vdh
+from .helpers import video_merger_helper as vmh
+
+FFMPEG = shutil.which('ffmpeg')
+FFPROBE = shutil.which('ffprobe')
+
+
+def _ffprobe(path):
+    """Reference result, in the same shape as vmh._probe_video, straight from ffprobe."""
+    result = subprocess.run([
+        FFPROBE, '-v', 'error',
+        '-show_entries',
+        'stream=index,codec_type,codec_name,width,height,sample_aspect_ratio,avg_frame_rate,pix_fmt,sample_rate,channels'
+        ':format=duration',
+        '-of', 'json', path
+    ], stdout=subprocess.PIPE, check=True)
+    probe = json.loads(result.stdout)
+    streams = probe['streams']
+    video_stream = next((st for st in streams if st.get('codec_type') == 'video'), None)
+    audio_stream = next((st for st in streams if st.get('codec_type') == 'audio'), None)
+    return video_stream, audio_stream, float(probe['format']['duration'])
+
+
+class FastProbeMp4Tests(SimpleTestCase):
+    """Checks the moov parser in video_merger_helper against ffprobe on MP4s made with the local FFmpeg."""
+
+    # name -> extra FFmpeg output arguments
+    FIXTURES = {
+        'baseline': ['-profile:v', 'baseline', '-pix_fmt', 'yuv420p'],
+        'high': ['-profile:v', 'high', '-pix_fmt', 'yuv420p'],
+        'high_pasp': ['-profile:v', 'high', '-pix_fmt', 'yuv420p', '-vf', 'setsar=4/3'],
+        'full_range': ['-profile:v', 'high', '-pix_fmt', 'yuvj420p', '-color_range', 'pc'],
+        'fragmented': ['-profile:v', 'high', '-pix_fmt', 'yuv420p', '-movflags', 'frag_keyframe+empty_moov'],
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        if not FFMPEG or not FFPROBE:
+            raise unittest.SkipTest("ffmpeg and ffprobe must be on PATH")
+        cls.fixture_dir = tempfile.mkdtemp(prefix='fast_probe_')
+        cls.paths = {}
+        for name, output_args in cls.FIXTURES.items():
+            path = os.path.join(cls.fixture_dir, f"{name}.mp4")
+            subprocess.run([
+                FFMPEG, '-v', 'error', '-y',
+                '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=2',
+                '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=48000:duration=2',
+                '-c:v', 'libx264', '-c:a', 'aac', '-ac', '2', *output_args, path
+            ], check=True)
+            cls.paths[name] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.fixture_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def assertMatchesFfprobe(self, name):
+        fast_result = vmh._fast_probe_mp4(self.paths[name])
+        self.assertIsNotNone(fast_result, f"{name} should be handled by the fast probe")
+        fast_video, fast_audio, fast_duration = fast_result
+        video, audio, duration = _ffprobe(self.paths[name])
+        for key in ('codec_name', 'width', 'height', 'pix_fmt'):
+            self.assertEqual(fast_video[key], video[key], key)
+        self.assertEqual(vmh._frame_rate(fast_video), vmh._frame_rate(video))
+        self.assertEqual(vmh._sample_aspect_ratio(fast_video), vmh._sample_aspect_ratio(video))
+        for key in ('codec_name', 'sample_rate', 'channels'):
+            self.assertEqual(fast_audio[key], audio[key], key)
+        self.assertAlmostEqual(fast_duration, duration, delta=0.1)
+        self.assertEqual(vmh._stream_signature(fast_video, fast_audio), vmh._stream_signature(video, audio))
+
+    def test_baseline_profile(self):
+        self.assertMatchesFfprobe('baseline')
+
+    def test_high_profile_without_pasp(self):
+        self.assertMatchesFfprobe('high')
+
+    def test_high_profile_with_pasp(self):
+        self.assertMatchesFfprobe('high_pasp')
+        self.assertEqual(vmh._sample_aspect_ratio(vmh._fast_probe_mp4(self.paths['high_pasp'])[0]), '4:3')
+
+    def test_full_range_falls_back_to_ffprobe(self):
+        self.assertIsNone(vmh._fast_probe_mp4(self.paths['full_range']))
+
+    def test_fragmented_falls_back_to_ffprobe(self):
+        self.assertIsNone(vmh._fast_probe_mp4(self.paths['fragmented']))
+
+
+class FastProbeMp4ParseErrorTests(SimpleTestCase):
+
+    def test_non_mp4_data_falls_back(self):
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as f:
+            f.write(b'not an mp4 file' * 10)
+        try:
+            self.assertIsNone(vmh._fast_probe_mp4(f.name))
+        finally:
+            os.remove(f.name)
+
+
+class ConcatListEntryTests(SimpleTestCase):
+
+    def test_plain_path(self):
+        path = os.path.abspath('clip.mp4').replace(os.sep, '/')
+        self.assertEqual(vmh._concat_list_entry('clip.mp4'), f"file '{path}'\n")
+
+    def test_apostrophe_closes_escapes_and_reopens_the_quote(self):
+        entry = vmh._concat_list_entry("it's here.mp4")
+        self.assertTrue(entry.startswith("file '"), entry)
+        self.assertTrue(entry.endswith("/it'\\''s here.mp4'\n"), entry)
+
+
+class FrameRateTests(SimpleTestCase):
+
+    def test_exact_ntsc_rate(self):
+        self.assertEqual(vmh._frame_rate({'avg_frame_rate': '30000/1001'}), Fraction(30000, 1001))
+
+    def test_equal_rates_compare_equal(self):
+        self.assertEqual(vmh._frame_rate({'avg_frame_rate': '60/2'}), vmh._frame_rate({'avg_frame_rate': '30/1'}))
+
+    def test_unknown_rate(self):
+        self.assertIsNone(vmh._frame_rate({'avg_frame_rate': '0/0'}))
+        self.assertIsNone(vmh._frame_rate({}))
+        self.assertIsNone(vmh._frame_rate({'avg_frame_rate': 'N/A'}))
+
+
+class RouteUrlTests(SimpleTestCase):
+
+    def assertRoutes(self, url, handler):
+        self.assertEqual(vdh.route_url(urlparse(url)), handler, url)
+
+    def test_known_hosts(self):
+        for host, handler in vdh.HOST_HANDLERS.items():
+            self.assertRoutes(f"https://{host}/some/video", handler)
+
+    def test_subdomains_resolve_to_the_parent_domain(self):
+        self.assertRoutes('https://m.youtube.com/watch?v=abc', vdh.YTDLP)
+        self.assertRoutes('https://www.youtube.com/watch?v=abc', vdh.YTDLP)
+        self.assertRoutes('https://player.vimeo.com/video/1', vdh.YTDLP)
+
+    def test_host_is_case_insensitive(self):
+        self.assertRoutes('https://Drive.Google.com/file/d/abc/view', vdh.GDRIVE)
+
+    def test_lookalike_host_is_not_matched(self):
+        self.assertRoutes('https://notyoutube.com/watch', None)
+
+    def test_direct_video_link(self):
+        self.assertRoutes('https://cdn.example.com/media/clip.MP4', vdh.GENERIC)
+
+    def test_unsupported_link(self):
+        self.assertRoutes('https://example.com/page.html', None)
+        self.assertRoutes('not a url', None)
+
+
+class MarketNamePrefixTests(SimpleTestCase):
+
+    def setUp(self):
+        self.helper = pipeline_helper.IntegratedPipelineHelper(output_stream=lambda message: None)
+
+    def prefix(self, *paragraphs):
+        ctx = SimpleNamespace(presentation=SimpleNamespace(slides=[object()]), first_slide_paragraphs=list(paragraphs))
+        return self.helper.get_market_name_prefix_for_videos('deck.pptx', ctx)
+
+    def test_takes_the_part_after_the_last_underscore(self):
+        self.assertEqual(self.prefix('Title', 'Market Name - North_Zone_Pune ', 'Zone - West'), 'Pune')
+
+    def test_value_without_underscore_is_used_whole(self):
+        self.assertEqual(self.prefix('Market Name - Pune'), 'Pune')
+
+    def test_value_ends_with_its_own_paragraph(self):
+        self.assertEqual(self.prefix('Market Name - Pune', 'Zone_West'), 'Pune')
+
+    def test_missing_marker(self):
+        self.assertEqual(self.prefix('Title', 'Zone - West'), '')
+
+    def test_no_slides(self):
+        ctx = SimpleNamespace(presentation=SimpleNamespace(slides=[]), first_slide_paragraphs=[])
+        self.assertEqual(self.helper.get_market_name_prefix_for_videos('deck.pptx', ctx), '')